@@ -0,0 +1,124 @@
+import math
+import time
+import numpy as np
+
+class VectorizedAlertBook:
+    """
+    整份監控清單的價格警報以 NumPy 陣列批次判斷（StockMonitor.run 單一代號判斷的批次版本）：
+    最新價、目標價、停損價、參考價、警報方向與冷卻時間各是一個以代號索引的陣列，
+    每一輪用幾次向量比較算出「漲破 / 跌破目標價」、「跌破停損」、「相對參考價變動超過 N%」，
+    只回傳觸發的索引。規則與單一代號模式相同：停損優先，兩者共用冷卻時間。
+    """
+    def __init__(self, capacity=64):
+        self.index = {}   # {symbol: 陣列索引}
+        self.symbols = [] # 索引 -> symbol
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        size = len(self.symbols)
+        old = getattr(self, "price", None)
+        fields = {
+            'price': (np.float64, np.nan),
+            'target': (np.float64, np.nan),
+            'stop': (np.float64, 0.0),
+            'reference': (np.float64, np.nan), # 百分比變動的基準價，觸發後移到觸發價
+            'move_pct': (np.float64, np.nan),  # nan 表示不啟用
+            'cooldown': (np.float64, 0.0),
+            'last_alert': (np.float64, -np.inf),
+            'mode': (np.int8, 0),              # 1 = 等待漲破, -1 = 等待跌破, 0 = 尚未判定
+        }
+        for name, (dtype, fill) in fields.items():
+            array = np.full(capacity, fill, dtype=dtype)
+            if old is not None:
+                array[:size] = getattr(self, name)[:size]
+            setattr(self, name, array)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def set_rule(self, symbol, target, stop_loss=0.0, cooldown=300, move_pct=None):
+        """新增或更新代號的規則；目標價變更時重新判定警報方向。"""
+        i = self.index.get(symbol)
+        if i is None:
+            i = len(self.symbols)
+            if i == len(self.price):
+                self._allocate(2 * len(self.price))
+            self.index[symbol] = i
+            self.symbols.append(symbol)
+            self.price[i] = np.nan
+            self.reference[i] = np.nan
+            self.last_alert[i] = -np.inf
+            self.mode[i] = 0
+        elif self.target[i] != target:
+            self.mode[i] = 0
+        self.target[i] = target
+        self.stop[i] = stop_loss or 0.0
+        self.cooldown[i] = cooldown
+        self.move_pct[i] = np.nan if move_pct is None else move_pct / 100
+
+    def remove(self, symbol):
+        """移除代號：以最後一個代號填補空位，陣列保持連續。"""
+        i = self.index.pop(symbol, None)
+        if i is None:
+            return
+        last = len(self.symbols) - 1
+        if i != last:
+            moved = self.symbols[last]
+            self.symbols[i] = moved
+            self.index[moved] = i
+            for name in ('price', 'target', 'stop', 'reference', 'move_pct', 'cooldown', 'last_alert', 'mode'):
+                array = getattr(self, name)
+                array[i] = array[last]
+        self.symbols.pop()
+
+    def update(self, symbols, prices):
+        """寫入一批最新價，回傳其索引陣列；第一次有價格的代號以該價作為參考價。"""
+        indices = np.fromiter((self.index[s] for s in symbols), dtype=np.intp, count=len(symbols))
+        self.price[indices] = np.asarray(prices, dtype=np.float64)
+        unset = indices[np.isnan(self.reference[indices])]
+        self.reference[unset] = self.price[unset]
+        return indices
+
+    def evaluate(self, indices=None, now=None):
+        """
+        判斷 indices (預設為全部) 的規則，回傳 {'stop_loss', 'target', 'move'}: 觸發的索引陣列。
+        只應傳入本輪有新價格的索引，避免以舊價格重複觸發。
+        """
+        now = time.time() if now is None else now
+        n = len(self.symbols)
+        price, target, mode = self.price[:n], self.target[:n], self.mode[:n]
+        active = ~np.isnan(price)
+        if indices is not None:
+            selected = np.zeros(n, dtype=bool)
+            selected[indices] = True
+            active &= selected
+
+        undecided = active & (mode == 0)
+        mode[undecided] = np.where(price[undecided] < target[undecided], 1, -1)
+
+        ready = (now - self.last_alert[:n]) > self.cooldown[:n]
+        stop_hit = active & ready & (self.stop[:n] > 0) & (price <= self.stop[:n])
+        target_hit = active & ready & ~stop_hit & (((mode == 1) & (price >= target)) | ((mode == -1) & (price <= target)))
+        self.last_alert[:n][stop_hit | target_hit] = now
+
+        reference = self.reference[:n]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            move_hit = active & (np.abs(price / reference - 1) >= self.move_pct[:n])
+        reference[move_hit] = price[move_hit]
+
+        return {
+            'stop_loss': np.flatnonzero(stop_hit),
+            'target': np.flatnonzero(target_hit),
+            'move': np.flatnonzero(move_hit)
+        }
+
+    def state(self, symbol):
+        """單一代號的目前狀態，供 API 顯示。"""
+        i = self.index[symbol]
+        mode = {1: 'above', -1: 'below'}.get(int(self.mode[i]))
+        last_alert = float(self.last_alert[i])
+        return {
+            'alert_mode': mode,
+            'last_alert_time': last_alert if math.isfinite(last_alert) else None,
+            'reference_price': None if np.isnan(self.reference[i]) else float(self.reference[i])
+        }
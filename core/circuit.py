@@ -0,0 +1,118 @@
+import math
+import threading
+import time
+from collections import deque
+
+class CircuitBreaker:
+    """
+    單一 provider 的斷路器，依最近 window 次呼叫的錯誤率與 p95 延遲判斷健康度：
+    - closed：正常放行
+    - open：錯誤率或 p95 延遲超標，open_seconds 內直接跳過此 provider
+    - half_open：冷卻結束後只放行一次探測，成功則恢復 closed，失敗則重新 open
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, window=20, min_calls=5, error_threshold=0.5, latency_threshold=None, open_seconds=30):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.latency_threshold = latency_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._samples = deque(maxlen=window) # [(成功與否, 延遲秒數)]
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否可以呼叫此 provider。"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self, latency):
+        with self._lock:
+            self._samples.append((True, latency))
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._probing = False
+                self._samples.clear()
+                self._samples.append((True, latency))
+            else:
+                self._evaluate()
+
+    def record_failure(self, latency):
+        with self._lock:
+            self._samples.append((False, latency))
+            if self.state == self.HALF_OPEN:
+                self._open()
+            else:
+                self._evaluate()
+
+    def _evaluate(self):
+        if len(self._samples) < self.min_calls:
+            return
+        if self._error_rate() >= self.error_threshold:
+            self._open()
+        elif self.latency_threshold and self._percentile(95) > self.latency_threshold:
+            self._open()
+
+    def _open(self):
+        if self.state != self.OPEN:
+            print(f"⚠️ {self.name} 斷路器開啟 (錯誤率 {self._error_rate()*100:.0f}%, p95 {self._percentile(95):.2f}s)")
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probing = False
+
+    def _error_rate(self):
+        if not self._samples:
+            return 0.0
+        return sum(1 for ok, _ in self._samples if not ok) / len(self._samples)
+
+    def _percentile(self, p):
+        if not self._samples:
+            return 0.0
+        latencies = sorted(latency for _, latency in self._samples)
+        index = min(len(latencies) - 1, max(0, math.ceil(p / 100 * len(latencies)) - 1))
+        return latencies[index]
+
+    @property
+    def sample_count(self):
+        with self._lock:
+            return len(self._samples)
+
+    @property
+    def error_rate(self):
+        with self._lock:
+            return self._error_rate()
+
+    def latency_percentile(self, p):
+        with self._lock:
+            return self._percentile(p)
+
+    @property
+    def p95_latency(self):
+        return self.latency_percentile(95)
+
+    def health_key(self):
+        """
+        排序用：只有斷路中 (open，或 half_open 探測進行中) 的 provider 會排到後面，其餘維持設定順序。
+        延遲與樣本數不參與排序：排到後面的 provider 不會再被呼叫、也就不會有新樣本，排序會永遠卡住；
+        錯誤率或 p95 延遲超標時斷路器本身就會開啟，冷卻結束後回到原位置接受半開探測。
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                return 0 if time.monotonic() - self.opened_at >= self.open_seconds else 2
+            if self.state == self.HALF_OPEN and self._probing:
+                return 1
+            return 0
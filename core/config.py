@@ -11,6 +11,7 @@ class SharedConfig:
         self._tapo_email = ""
         self._tapo_password = ""
         self._tapo_ip = "192.168.100.150" # Default for current user
+        self._watchlist = [] # 多代號監控清單 [{symbol, target_price, stop_loss_price, cooldown_seconds}]，空清單時只監控 symbol
         self._lock = threading.Lock()
         self._load_config() # 嘗試讀取存檔
 
@@ -26,6 +27,7 @@ class SharedConfig:
                     self._tapo_email = data.get("tapo_email", "")
                     self._tapo_password = data.get("tapo_password", "")
                     self._tapo_ip = data.get("tapo_ip", self._tapo_ip)
+                    self._watchlist = self._normalize_watchlist(data.get("watchlist", []))
                     print(f"✅ 已讀取設定檔: {self._symbol}, 目標 {self._target_price}")
             except Exception as e:
                 print(f"⚠️ 讀取設定檔失敗: {e}")
@@ -38,7 +40,8 @@ class SharedConfig:
             "stop_loss_price": self._stop_loss_price,
             "tapo_email": self._tapo_email,
             "tapo_password": self._tapo_password,
-            "tapo_ip": self._tapo_ip
+            "tapo_ip": self._tapo_ip,
+            "watchlist": self._watchlist
         }
         try:
             with open(self._config_file, 'w', encoding='utf-8') as f:
@@ -71,6 +74,46 @@ class SharedConfig:
             except ValueError:
                 print(f"Invalid target price: {value}. Ignoring.")
 
+    @staticmethod
+    def _normalize_watchlist(items):
+        """整理監控清單：代號轉大寫、價格轉 float，略過格式錯誤與重複的代號。"""
+        watchlist = []
+        seen = set()
+        for item in items or []:
+            try:
+                symbol = item['symbol'].strip().upper()
+                entry = {
+                    "symbol": symbol,
+                    "target_price": float(item['target_price']),
+                    "stop_loss_price": float(item.get('stop_loss_price') or 0.0)
+                }
+                if item.get('cooldown_seconds'):
+                    entry["cooldown_seconds"] = float(item['cooldown_seconds'])
+                if item.get('move_alert_pct'):
+                    entry["move_alert_pct"] = float(item['move_alert_pct'])
+                for key in ("take_profit_levels", "stop_loss_levels"):
+                    if item.get(key):
+                        entry[key] = sorted(float(level) for level in item[key])
+            except (KeyError, TypeError, ValueError, AttributeError):
+                print(f"Invalid watchlist entry: {item}. Ignoring.")
+                continue
+            if symbol and symbol not in seen:
+                seen.add(symbol)
+                watchlist.append(entry)
+        return watchlist
+
+    @property
+    def watchlist(self):
+        with self._lock:
+            return [dict(item) for item in self._watchlist]
+
+    def set_watchlist(self, items):
+        """設定監控清單並存檔，回傳整理後的清單。"""
+        with self._lock:
+            self._watchlist = self._normalize_watchlist(items)
+            self._save_config()
+            return [dict(item) for item in self._watchlist]
+
     @property
     def tapo_email(self):
         with self._lock:
@@ -95,7 +138,8 @@ class SharedConfig:
                 "tapo_email": self._tapo_email,
                 "tapo_ip": self._tapo_ip,
                 # 為了安全，不回傳密碼到前端，或者只回傳是否有設定
-                "tapo_password_set": bool(self._tapo_password)
+                "tapo_password_set": bool(self._tapo_password),
+                "watchlist": [dict(item) for item in self._watchlist]
             }
 
     def update_config(self, symbol, target_price, stop_loss_price=None, tapo_email=None, tapo_password=None, tapo_ip=None):
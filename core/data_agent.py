@@ -1,10 +1,20 @@
-import datetime
 import time
-import requests
-import yfinance as yf
-import statistics
+import random
 import threading
 from abc import ABC, abstractmethod  
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from core.metadata_cache import SymbolMetadataCache
+from core.history import PriceRingBuffer
+from core.flash_crash import FlashCrashDetector, DEFAULT_CRASH_WINDOWS
+from core.sessions import calendar_for_symbol
+from core.http import UpstreamError, get_http_client
+from core.twse import TwseMisClient
+from core.yahoo_chart import YahooChartClient
+from core.ticks import TickConflator, parse_trade
+from core.singleflight import SingleFlight
+from core.rate_limit import get_rate_limiter
+from core.circuit import CircuitBreaker
+from core.hedge import HedgeBudget
 
 class MarketDataProvider(ABC):
     @abstractmethod
@@ -19,9 +29,65 @@ class MarketDataProvider(ABC):
     def is_market_open(self, symbol):
         pass
 
+    def get_prices(self, symbols):
+        """批次取得多檔報價，回傳 {symbol: price}。預設逐檔呼叫 get_price，可由子類別覆寫為單次批量請求。"""
+        return {symbol: self.get_price(symbol) for symbol in symbols}
+
+    def get_metadata(self, symbol):
+        """回傳代號基本資料 {'name', 'currency', 'exchange'}，查詢失敗時回傳 None。"""
+        return {'name': self.get_name(symbol), 'currency': None, 'exchange': None}
+
+    def get_metadata_many(self, symbols):
+        """批次取得多檔基本資料 {symbol: metadata}。預設逐檔呼叫 get_metadata，可由子類別覆寫為單次批量請求。"""
+        return {symbol: self.get_metadata(symbol) for symbol in symbols}
+
+    rate_limiter = None # 共用的 AdaptiveRateLimiter，供排程器依限流狀態調整輪詢間隔
+
+    def get_calendar(self, symbol):
+        """回傳交易所日曆 (ExchangeCalendar)，全天候交易的市場回傳 None。"""
+        return None
+
+    def get_history(self, symbol, minutes):
+        """回傳最近 minutes 分鐘的 1 分 K 收盤價 [(timestamp, price)]（由舊到新），不支援時回傳空列表。"""
+        return []
+
+    def get_tick(self, symbol):
+        """推播型 provider 的最新成交 (price, 交易所成交時間)；不支援時回傳 None。"""
+        return None
+
+    supports_push = False # 是否支援 add_tick_listener (成交推播)
+
 class YFinanceProvider(MarketDataProvider):
+    """
+    Yahoo Finance 報價：熱路徑走 YahooChartClient (chart JSON，不經 pandas)，
+    chart 端點查無資料時才延遲載入 yfinance 作為後備。
+    """
+    def __init__(self, chart_client=None):
+        self.chart = chart_client or YahooChartClient()
+        self.rate_limiter = self.chart.rate_limiter
+
+    def _throttle(self):
+        """
+        yfinance 自行管理連線，無法讀取回應標頭；每個請求送出前先向共用限流器取得額度。
+        後備路徑不等待額度，額度不足時直接放棄 (拋出 RateLimitExceeded)，不拖慢整批報價。
+        """
+        self.rate_limiter.acquire(timeout=0)
+
+    def _note_error(self, e):
+        """yfinance 被限流時 (YFRateLimitError / 429) 通知限流器暫停。"""
+        if type(e).__name__ == 'YFRateLimitError' or 'Too Many Requests' in str(e) or '429' in str(e):
+            self.rate_limiter.throttle()
+
     def get_price(self, symbol):
+        quote = self.chart.get_quote(symbol)
+        if quote:
+            return quote['price']
+        return self._yfinance_price(symbol)
+
+    def _yfinance_price(self, symbol):
         try:
+            import yfinance as yf
+            self._throttle()
             ticker = yf.Ticker(symbol)
             # 優先嘗試 fast_info
             try:
@@ -32,160 +98,506 @@ class YFinanceProvider(MarketDataProvider):
                 pass
             
             # 嘗試 history
+            self._throttle()
             hist = ticker.history(period="1d", interval="1m")
             if not hist.empty:
                 return hist['Close'].iloc[-1]
             
             # 最後嘗試 5d history
+            self._throttle()
             hist = ticker.history(period="5d")
             if not hist.empty:
                 return hist['Close'].iloc[-1]
         except Exception as e:
+            self._note_error(e)
             print(f"YFinanceProvider Error: {e}")
         return None
 
+    def get_prices(self, symbols):
+        """
+        以 spark 端點批次取得整批報價 (每 20 檔一個請求)；請求成功但查無資料的代號才逐檔 fallback 到 yfinance。
+        請求本身失敗 (含本地限流拒絕) 的代號不改用 yfinance，整批失敗時拋出例外交給斷路器。
+        """
+        symbols = list(dict.fromkeys(symbols))
+        answered = set()
+        quotes = self.chart.get_quotes(symbols, answered)
+        prices = {}
+        for symbol in symbols:
+            quote = quotes.get(symbol)
+            if quote:
+                prices[symbol] = quote['price']
+            else:
+                prices[symbol] = self._yfinance_price(symbol) if symbol in answered else None
+        return prices
+
     def get_name(self, symbol):
+        metadata = self.get_metadata(symbol)
+        return metadata['name'] if metadata else symbol
+
+    def get_metadata(self, symbol):
+        quote = self.chart.get_quote(symbol)
+        if quote and quote['name']:
+            return {'name': quote['name'], 'currency': quote['currency'], 'exchange': quote['exchange']}
         try:
+            import yfinance as yf
+            self._throttle()
             ticker = yf.Ticker(symbol)
             info = ticker.info
-            return info.get('longName') or info.get('shortName') or symbol
-        except Exception:
-            return symbol
+            return {
+                'name': info.get('longName') or info.get('shortName') or symbol,
+                'currency': info.get('currency'),
+                'exchange': info.get('exchange')
+            }
+        except Exception as e:
+            self._note_error(e)
+            return None
+
+    def get_metadata_many(self, symbols):
+        """名稱與幣別隨 spark 批次報價一起取得，缺少名稱的代號才逐檔查詢。"""
+        answered = set()
+        try:
+            quotes = self.chart.get_quotes(symbols, answered)
+        except Exception as e:
+            print(f"YFinanceProvider metadata Error: {e}")
+            return {}
+        metadata = {}
+        for symbol in symbols:
+            quote = quotes.get(symbol)
+            if quote and quote['name']:
+                metadata[symbol] = {'name': quote['name'], 'currency': quote['currency'], 'exchange': quote['exchange']}
+            elif symbol in answered:
+                metadata[symbol] = self.get_metadata(symbol)
+        return metadata
+
+    def get_history(self, symbol, minutes):
+        return self.chart.get_history(symbol, minutes)
+
+    def get_calendar(self, symbol):
+        return calendar_for_symbol(symbol)
 
     def is_market_open(self, symbol):
-        now = datetime.datetime.now()
-        if '.TW' in symbol.upper() or '.TWO' in symbol.upper():
-            if now.weekday() >= 5:
-                return False
-            current_time = now.time()
-            return datetime.time(9, 0) <= current_time <= datetime.time(13, 30)
-        else:
-            # 美股概略
-            if now.weekday() == 5:
-                return now.time() <= datetime.time(6, 0)
-            if now.weekday() == 6:
-                return False
-            if now.weekday() == 0:
-                return now.time() >= datetime.time(21, 0)
-            current_time = now.time()
-            return current_time >= datetime.time(21, 0) or current_time <= datetime.time(6, 0)
+        # 依交易所日曆判斷（含時區、夏令時間、國定假日與提前收盤）
+        return self.get_calendar(symbol).is_open()
  
 class BinanceProvider(MarketDataProvider):
-    def __init__(self):
-        self.current_price = None
-        self.last_update_time = 0
+    """
+    Binance 報價：所有幣種共用一條 combined stream (/stream) 長連線。
+    新增或移除幣種透過 SUBSCRIBE/UNSUBSCRIBE 訊息即時切換，不會重新連線；
+    每個幣種的最新成交價存放在各自的 slot 中。
+    連線由背景 supervisor 維持：斷線或心跳逾時會以指數退避 + 抖動重連，
+    重連後以 REST 1 秒 K 線補齊斷線期間的價格：開始前呼叫 gap_begin_listener(symbol)，
+    完成 (含失敗) 後透過 gap_listener(symbol, points) 交給歷史資料。
+    """
+    WS_URL = "wss://stream.binance.com:9443/stream"
+    REST_URL = "https://api.binance.com/api/v3"
+    STALE_SECONDS = 5 # 超過 5 秒沒更新視為過期，改用 REST 補救
+    PING_INTERVAL = 20 # WebSocket ping/pong：20 秒送一次，10 秒內沒有 pong 視為斷線
+    PING_TIMEOUT = 10
+    HEARTBEAT_IDLE = 15 # 有訂閱但 15 秒沒有任何訊息時，送出 LIST_SUBSCRIPTIONS 當作應用層心跳
+    HEARTBEAT_TIMEOUT = 30 # 30 秒仍沒有任何訊息則主動斷線重連
+    RECONNECT_BASE = 1.0
+    RECONNECT_MAX = 60.0
+    GAP_FILL_MAX_SECONDS = 3600 # 最多補齊重連前 1 小時
+    GAP_FILL_INTERVAL = "1s" # 以 1 秒 K 線的收盤價補齊：不論成交多密集，1 小時都只要 4 頁
+    GAP_FILL_PAGE_SIZE = 1000
+    GAP_FILL_MAX_PAGES = 4
+
+    def __init__(self, http_client=None):
+        self.http = http_client or get_http_client()
+        self.rate_limiter = get_rate_limiter('binance')
         self.ws_thread = None
         self.ws_app = None
         self.running = False
-        self.symbol = "BTCUSDT" # Default
+        self.connected = False
+        self.gap_begin_listener = None # callable(symbol)，補齊開始前呼叫
+        self.gap_listener = None # callable(symbol, [(timestamp, price)])，每個 gap_begin_listener 之後必定呼叫一次
+        self.connections = 0 # 成功建立連線的次數，第二次起為重連
+        self._aliases = {} # 已訂閱的幣種 {BTCUSDT: 使用者代號 (例如 BTC-USD)}，回報歷史與 tick 時使用使用者的代號
+        self.ticks = TickConflator() # 最新成交與每秒 OHLCV，由 WebSocket 執行緒無鎖寫入
+        self._listeners = {} # {BTCUSDT: (callback, ...)}，copy-on-write，推播時不需持鎖
+        self._request_id = 0
+        self._last_message = 0.0 # monotonic，最後一次收到任何訊息的時間
         self._lock = threading.Lock()
-        
-    def _start_ws(self, symbol):
-        import websocket
+
+    @staticmethod
+    def normalize_symbol(symbol):
+        """轉換 symbol 格式：BTC-USD -> BTCUSDT"""
+        clean_symbol = symbol.replace("-", "").upper()
+        if clean_symbol.endswith("USD"):
+            clean_symbol = clean_symbol[:-3] + "USDT"
+        return clean_symbol
+
+    @staticmethod
+    def _stream_name(clean_symbol):
+        return f"{clean_symbol.lower()}@trade"
+
+    supports_push = True
+
+    def add_tick_listener(self, symbol, callback):
+        """每筆成交在 WebSocket 執行緒上呼叫 callback(symbol, price, 交易所成交時間)；callback 應只做輕量工作。"""
+        clean_symbol = self.normalize_symbol(symbol)
+        with self._lock:
+            self._listeners[clean_symbol] = self._listeners.get(clean_symbol, ()) + (callback,)
+        self.subscribe([symbol])
+
+    def remove_tick_listener(self, symbol, callback):
+        clean_symbol = self.normalize_symbol(symbol)
+        with self._lock:
+            remaining = tuple(cb for cb in self._listeners.get(clean_symbol, ()) if cb != callback)
+            if remaining:
+                self._listeners[clean_symbol] = remaining
+            else:
+                self._listeners.pop(clean_symbol, None)
+
+    def _publish(self, clean_symbol, price, timestamp):
+        listeners = self._listeners.get(clean_symbol)
+        if not listeners:
+            return
+        symbol = self._aliases.get(clean_symbol, clean_symbol)
+        for callback in listeners:
+            try:
+                callback(symbol, price, timestamp)
+            except Exception as e:
+                print(f"Tick Listener Error: {e}")
+
+    def subscribe(self, symbols):
+        """
+        訂閱一批幣種，回傳本次新增的 symbol 列表。
+        同一批只送一則 SUBSCRIBE（Binance 限制每秒最多 5 則上行訊息）。
+        """
+        added = []
+        with self._lock:
+            for symbol in symbols:
+                clean_symbol = self.normalize_symbol(symbol)
+                if clean_symbol not in self._aliases:
+                    self._aliases[clean_symbol] = symbol
+                    added.append(clean_symbol)
+        self._ensure_connection()
+        if added:
+            self._send("SUBSCRIBE", [self._stream_name(s) for s in added])
+        return added
+
+    def unsubscribe(self, symbols):
+        removed = []
+        with self._lock:
+            for symbol in symbols:
+                clean_symbol = self.normalize_symbol(symbol)
+                if self._aliases.pop(clean_symbol, None) is not None:
+                    self.ticks.discard(clean_symbol)
+                    removed.append(clean_symbol)
+        if removed:
+            self._send("UNSUBSCRIBE", [self._stream_name(s) for s in removed])
+        return removed
+
+    def _send(self, method, streams):
+        """送出訂閱變更；尚未連線時略過，連線建立後 on_open 會補送完整訂閱清單。"""
         import json
-        
-        # 轉換 symbol 格式：BTC-USD -> btcusdt
-        clean_symbol = symbol.replace("-", "").lower()
-        if clean_symbol.endswith("usd") and not clean_symbol.endswith("usdt"):
-            clean_symbol = clean_symbol.replace("usd", "usdt")
-            
-        url = f"wss://stream.binance.com:9443/ws/{clean_symbol}@trade"
-        
+
+        if not self.connected or not self.ws_app:
+            return
+        with self._lock:
+            self._request_id += 1
+            request_id = self._request_id
+        message = {"method": method, "id": request_id}
+        if streams is not None:
+            message["params"] = streams
+        try:
+            self.ws_app.send(json.dumps(message))
+        except Exception as e:
+            print(f"Binance WS {method} Error: {e}")
+
+    def _ensure_connection(self):
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+        self.ws_thread = threading.Thread(target=self._supervise, name="binance-ws", daemon=True)
+        self.ws_thread.start()
+        threading.Thread(target=self._watchdog, name="binance-ws-watchdog", daemon=True).start()
+
+    def close(self):
+        """停止 supervisor 並關閉連線。"""
+        self.running = False
+        if self.ws_app:
+            self.ws_app.close()
+
+    def _reconnect_delay(self, attempt):
+        """指數退避 + full jitter：第 n 次失敗等待 0 ~ min(上限, 基準 × 2^n) 秒。"""
+        return random.uniform(0, min(self.RECONNECT_MAX, self.RECONNECT_BASE * (2 ** attempt)))
+
+    def _supervise(self):
+        """維持連線：run_forever 結束 (斷線、ping 逾時、看門狗關閉) 後退避重連，直到 close()。"""
+        attempt = 0
+        while self.running:
+            started = time.monotonic()
+            try:
+                self._run_ws()
+            except Exception as e:
+                print(f"Binance WS Error: {e}")
+            finally:
+                self.connected = False
+            if not self.running:
+                break
+            # 連線撐過一段時間才算成功，重置退避次數
+            attempt = 0 if time.monotonic() - started > self.RECONNECT_MAX else attempt + 1
+            delay = self._reconnect_delay(attempt)
+            print(f"Binance WS 斷線，{delay:.1f} 秒後重連 (第 {attempt} 次)")
+            time.sleep(delay)
+
+    def _watchdog(self):
+        """應用層心跳：有訂閱卻長時間沒有訊息時先送 LIST_SUBSCRIPTIONS 試探，仍無回應就關閉連線觸發重連。"""
+        while self.running:
+            time.sleep(self.HEARTBEAT_IDLE / 3)
+            if not self.connected or not self._aliases:
+                continue
+            idle = time.monotonic() - self._last_message
+            if idle > self.HEARTBEAT_TIMEOUT:
+                print(f"Binance WS {idle:.0f} 秒沒有訊息，重新連線")
+                self.connected = False
+                self.ws_app.close()
+            elif idle > self.HEARTBEAT_IDLE:
+                self._send("LIST_SUBSCRIPTIONS", None)
+
+    def _run_ws(self):
+        import websocket
+
+        def on_open(ws):
+            self._last_message = time.monotonic()
+            self.connected = True
+            with self._lock:
+                subscribed = dict(self._aliases)
+            streams = [self._stream_name(s) for s in subscribed]
+            latest = {s: self.ticks.latest(s) for s in subscribed}
+            gaps = [(s, tick[1]) for s, tick in latest.items() if tick] if self.connections else []
+            # 先通知歷史資料暫存即時成交，訂閱恢復後的新成交才不會搶在補齊的舊成交之前寫入
+            if gaps and self.gap_begin_listener:
+                for clean_symbol, _ in gaps:
+                    self.gap_begin_listener(subscribed[clean_symbol])
+            if streams:
+                self._send("SUBSCRIBE", streams)
+            if gaps:
+                threading.Thread(target=self._fill_gaps, args=(gaps, time.time(), subscribed), daemon=True).start()
+            self.connections += 1
+
         def on_message(ws, message):
+            self._last_message = time.monotonic()
             try:
-                data = json.loads(message)
-                price = float(data['p'])
-                with self._lock:
-                    self.current_price = price
-                    self.last_update_time = time.time()
+                trade = parse_trade(message)
+                if trade is None or trade[0] not in self._aliases:
+                    return # SUBSCRIBE/UNSUBSCRIBE 的回應：{"result": null, "id": n}，或已退訂的幣種
+                self.ticks.on_trade(*trade)
+                self._publish(trade[0], trade[1], trade[3])
             except Exception as e:
                 print(f"WS Message Error: {e}")
-                
+
         def on_error(ws, error):
             print(f"Binance WS Error: {error}")
-            
+
         def on_close(ws, close_status_code, close_msg):
+            self.connected = False
             print("Binance WS Closed")
-            
-        self.ws_app = websocket.WebSocketApp(url,
+
+        self.ws_app = websocket.WebSocketApp(self.WS_URL,
+                                    on_open=on_open,
                                     on_message=on_message,
                                     on_error=on_error,
                                     on_close=on_close)
-                                    
-        self.ws_app.run_forever()
+        self.ws_app.run_forever(ping_interval=self.PING_INTERVAL, ping_timeout=self.PING_TIMEOUT)
 
-    def get_price(self, symbol):
-        # 檢查是否需要啟動或切換 WS
-        target_symbol = symbol.replace("-", "").upper()
-        if target_symbol.endswith("USD"):
-            target_symbol = target_symbol.replace("USD", "USDT")
-            
-        if self.symbol != target_symbol or not self.running:
-            if self.ws_thread:
-                self.running = False
-                if self.ws_app: 
+    def _fill_gaps(self, gaps, until, aliases=None):
+        """
+        以 REST K 線補齊各幣種從最後一筆報價到重連之間的價格。
+        不論補齊成功與否都會呼叫 gap_listener，讓暫存的即時成交得以寫入。
+        """
+        aliases = self._aliases if aliases is None else aliases
+        for clean_symbol, since in gaps:
+            symbol = aliases.get(clean_symbol, clean_symbol)
+            points = []
+            try:
+                points = self._fetch_klines(clean_symbol, max(since, until - self.GAP_FILL_MAX_SECONDS), until)
+            finally:
+                if self.gap_listener:
                     try:
-                        self.ws_app.close()
-                    except:
-                        pass
-            
-            self.symbol = target_symbol
-            self.running = True
-            self.ws_thread = threading.Thread(target=self._start_ws, args=(symbol,), daemon=True)
-            self.ws_thread.start()
-            # 給它一點時間連線，先用 REST 抓一次
+                        count = self.gap_listener(symbol, points)
+                        if points:
+                            print(f"Binance WS 已補齊 {symbol} 斷線期間 {count} 筆成交")
+                    except Exception as e:
+                        print(f"Binance Gap Fill Error: {e}")
+
+    def _fetch_klines(self, clean_symbol, since, until):
+        """
+        取得 (since, until] 之間每根 K 線的 (收盤時間, 收盤價)，由 until 往回分頁：
+        只帶 endTime 時 Binance 回傳結束於該時間的最近 GAP_FILL_PAGE_SIZE 根，最多讀 GAP_FILL_MAX_PAGES 頁。
+        頁數不夠時缺的是最舊的一段，緊接在重連後即時成交之前的部分一定完整。
+        收盤時間晚於 until 的 K 線 (重連時尚未收盤) 不採用，以免混入重連後的價格。
+        """
+        points = []
+        since_ms = int(since * 1000)
+        until_ms = int(until * 1000)
+        end_ms = until_ms
+        for _ in range(self.GAP_FILL_MAX_PAGES):
+            try:
+                response = self.http.get(f"{self.REST_URL}/klines", params={
+                    "symbol": clean_symbol, "interval": self.GAP_FILL_INTERVAL,
+                    "endTime": end_ms, "limit": self.GAP_FILL_PAGE_SIZE
+                }, limiter=self.rate_limiter)
+                if response.status_code != 200:
+                    print(f"BinanceREST klines HTTP {response.status_code}")
+                    break
+                klines = response.json()
+            except Exception as e:
+                print(f"BinanceREST klines Error: {e}")
+                break
+            # K 線格式：[開盤時間, 開, 高, 低, 收, 量, 收盤時間, ...]
+            points[:0] = [(k[6] / 1000, float(k[4])) for k in klines if since_ms < k[6] <= until_ms]
+            if len(klines) < self.GAP_FILL_PAGE_SIZE or klines[0][0] <= since_ms:
+                break
+            end_ms = klines[0][0] - 1
+        return points
+
+    def get_price(self, symbol):
+        clean_symbol = self.normalize_symbol(symbol)
+        if self.subscribe([symbol]):
+            # 新訂閱的幣種還沒有推播資料，先用 REST 抓一次
             return self._fetch_rest_price(symbol)
 
-        # 檢查數據新鮮度 (Staleness Check)
-        with self._lock:
-            now = time.time()
-            if self.current_price and (now - self.last_update_time < 5):
-                return self.current_price
-            
+        # 檢查數據新鮮度 (Staleness Check)，以本地收到的時間判斷
+        tick = self.ticks.latest(clean_symbol)
+        if tick and (time.time() - tick[2] < self.STALE_SECONDS):
+            return tick[0]
+
         # 如果數據過期 (超過 5 秒沒更新)，使用 REST 補救
-        # print("DEBUG: Data stale, falling back to REST")
         return self._fetch_rest_price(symbol)
 
-    def _fetch_rest_price(self, symbol):
+    def get_prices(self, symbols):
+        """
+        推播中的幣種直接讀記憶體，沒有新鮮 tick 的才以 REST 補查。
+        REST 全部失敗 (連線錯誤 / HTTP 錯誤) 時拋出例外讓斷路器記錄；查無此幣種只回傳 None。
+        """
+        self.subscribe(symbols)
+        prices = {}
+        error = None
+        answered = False
+        for symbol in symbols:
+            tick = self.ticks.latest(self.normalize_symbol(symbol))
+            if tick and time.time() - tick[2] < self.STALE_SECONDS:
+                prices[symbol] = tick[0]
+                answered = True
+                continue
+            try:
+                prices[symbol] = self._fetch_rest_price(symbol, raise_errors=True)
+                answered = True
+            except Exception as e:
+                print(f"BinanceREST Error: {e}")
+                prices[symbol] = None
+                error = e
+        if error is not None and not answered:
+            raise error
+        return prices
+
+    def get_tick(self, symbol):
+        """最新成交 (price, 交易所成交時間)；沒有資料時回傳 None。"""
+        tick = self.ticks.latest(self.normalize_symbol(symbol))
+        return tick[:2] if tick else None
+
+    @property
+    def feed_lag(self):
+        """本地接收時間落後交易所成交時間的 EWMA (秒)。"""
+        return self.ticks.feed_lag
+
+    def _fetch_rest_price(self, symbol, raise_errors=False):
+        """REST 查價，查無此幣種 (HTTP 400) 回傳 None；raise_errors=True 時連線錯誤與其他 HTTP 錯誤改為拋出。"""
         try:
-            clean_symbol = symbol.replace("-", "").upper()
-            if clean_symbol.endswith("USD"):
-                clean_symbol = clean_symbol.replace("USD", "USDT")
-            
-            url = f"https://api.binance.com/api/v3/ticker/price?symbol={clean_symbol}"
-            response = requests.get(url, timeout=5)
+            clean_symbol = self.normalize_symbol(symbol)
+            url = f"{self.REST_URL}/ticker/price"
+            # 即時報價只重試一次，過期的價格沒有意義
+            response = self.http.get(url, params={"symbol": clean_symbol}, retries=1, limiter=self.rate_limiter)
             if response.status_code == 200:
                 data = response.json()
                 price = float(data['price'])
-                with self._lock:
-                    self.current_price = price
-                    self.last_update_time = time.time()
+                if clean_symbol in self._aliases:
+                    self.ticks.on_quote(clean_symbol, price)
                 return price
+            if response.status_code != 400:
+                raise UpstreamError(f"Binance ticker HTTP {response.status_code}")
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"BinanceREST Error: {e}")
         return None
 
+    def get_history(self, symbol, minutes):
+        try:
+            clean_symbol = self.normalize_symbol(symbol)
+            url = f"{self.REST_URL}/klines"
+            params = {"symbol": clean_symbol, "interval": "1m", "limit": min(max(minutes, 1), 1000)}
+            response = self.http.get(url, params=params, limiter=self.rate_limiter)
+            if response.status_code != 200:
+                return []
+            now = time.time()
+            # kline: [openTime, open, high, low, close, volume, closeTime, ...]
+            return [(min(k[6] / 1000, now), float(k[4])) for k in response.json()]
+        except Exception as e:
+            print(f"BinanceREST History Error: {e}")
+            return []
+
     def get_name(self, symbol):
         return symbol.split("-")[0].upper() + " (Crypto)"
 
+    def get_metadata(self, symbol):
+        return {'name': self.get_name(symbol), 'currency': 'USDT', 'exchange': 'Binance'}
+
     def is_market_open(self, symbol):
         return True # Crypto 24/7
 
 class TaiwanStockProvider(MarketDataProvider):
     """
-    這是一個使用公開 API 的簡單實作。
-    實務上可能需要更穩定的數據源如 Fugle。
-    這裡先使用 yfinance 作為 fallback 或特定的 TWSE 介面。
+    台股報價：使用證交所 MIS 即時報價（上市、上櫃可在同一個請求中批次查詢）。
+    查無報價時由 MarketDataAgent 的 failover 鏈改用 yfinance。
     """
-    def __init__(self):
+    def __init__(self, http_client=None):
         self.yf = YFinanceProvider()
+        self.mis = TwseMisClient(http_client=http_client)
+        self.rate_limiter = self.mis.rate_limiter
 
     def get_price(self, symbol):
-        # 這裡可以加入更即時的台股 API 抓取邏輯
-        return self.yf.get_price(symbol)
+        return self.get_prices([symbol]).get(symbol)
+
+    def get_prices(self, symbols):
+        quotes = self.mis.get_quotes(symbols)
+        return {symbol: quotes[symbol]['price'] if symbol in quotes else None for symbol in symbols}
 
     def get_name(self, symbol):
-        return self.yf.get_name(symbol)
+        metadata = self.get_metadata(symbol)
+        return metadata['name'] if metadata else symbol
+
+    def get_metadata(self, symbol):
+        return self.get_metadata_many([symbol]).get(symbol)
+
+    def get_metadata_many(self, symbols):
+        """整批名稱以一次 MIS 請求取得，MIS 查無的代號才改查 Yahoo。"""
+        try:
+            quotes = self.mis.get_quotes(symbols)
+        except Exception as e:
+            print(f"TWSE MIS metadata Error: {e}")
+            quotes = {}
+        metadata = {}
+        missing = []
+        for symbol in symbols:
+            quote = quotes.get(symbol)
+            if quote and quote['name']:
+                metadata[symbol] = {'name': quote['name'], 'currency': 'TWD', 'exchange': quote['exchange']}
+            else:
+                missing.append(symbol)
+        if missing:
+            metadata.update(self.yf.get_metadata_many(missing))
+        return metadata
+
+    def get_history(self, symbol, minutes):
+        return self.yf.get_history(symbol, minutes)
+
+    def get_calendar(self, symbol):
+        return self.yf.get_calendar(symbol)
 
     def is_market_open(self, symbol):
         return self.yf.is_market_open(symbol)
@@ -199,97 +611,453 @@ class MarketDataAgent:
         }
         import os
         self.simulation_mode = os.getenv("SIMULATION_MODE", "false").lower() == "true"
-        self.price_history = {} # {symbol: [(timestamp, price)]}
+        # 歷史資料以「時間長度」保留，而非固定筆數：不論 0.5 秒的幣圈或 10 秒的股票，
+        # 偵測視窗涵蓋的時間跨度都一致；記憶體上限 = 保留秒數 × 最高 tick 頻率
+        self.history_horizon_seconds = 15 * 60
+        self.max_ticks_per_second = 2
+        self.baseline_seconds = 5 * 60 # Z-score 基準視窗
+        self.price_history = {} # {symbol: PriceRingBuffer}
+        self.crash_windows = DEFAULT_CRASH_WINDOWS # 閃崩偵測的多時間框架設定
+        self._detectors = {} # {symbol: FlashCrashDetector}
+        self._held_ticks = {} # {symbol: [(timestamp, price)]}，補齊斷線期間歷史時暫存的即時報價
         self.lock = threading.Lock()
+        self.metadata_cache = SymbolMetadataCache() # 所有 provider 共用的名稱/幣別快取
+        # 並行抓取：各 provider 分組的報價與名稱查詢同時送出，逾時由 _fetch_quotes 依 provider_timeouts 控制
+        self._fanout_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="market-data")
+        # 請求合併：同一 (provider, symbol) 的並行查詢共用一次抓取，結果在新鮮期內直接重用
+        self._flight = SingleFlight()
+        self.quote_freshness = {
+            'YFinanceProvider': 2.0,
+            'TaiwanStockProvider': 2.0,
+            'BinanceProvider': 0.2 # 推播報價本來就在記憶體，只合併極短時間內的重複查詢
+        }
+        # Failover 鏈：主要 provider 失敗或斷路時依序改用後備來源，全部失敗才回傳標記為 stale 的最後快取價
+        self.failover_chains = {
+            'tw': ('tw', 'yf'),
+            'binance': ('binance', 'yf'),
+            'yf': ('yf',)
+        }
+        self.provider_timeouts = {'yf': 6.0, 'tw': 3.0, 'binance': 3.0} # 單一 provider 的等待上限 (秒)
+        self.breakers = {
+            key: CircuitBreaker(provider.__class__.__name__, latency_threshold=self.provider_timeouts[key] * 0.8)
+            for key, provider in self.providers.items()
+        }
+        self._provider_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="provider")
+        # Binance 重連後補齊的斷線期間成交寫入歷史，閃崩偵測的時間軸不會出現空洞；
+        # 補齊期間的即時報價先暫存，補齊完成後再依時間順序寫入
+        self.providers['binance'].gap_begin_listener = self.hold_ticks
+        self.providers['binance'].gap_listener = self.ingest_history
+        # 對衝請求 (選用)：主要 provider 超過其 p90 延遲仍未回應時，同時向下一個來源送出相同查詢，採用先回來的結果。
+        # 每個主要 provider 的對衝額度最多為其請求數的 10%；鏈上沒有其他來源時對同一 provider 重送一次
+        self.hedging = os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+        self.hedge_percentile = 90
+        self.hedge_min_delay = 0.05
+        self.hedge_budgets = {key: HedgeBudget(ratio=0.1, burst=3.0) for key in self.providers}
 
-    def _select_provider(self, symbol):
+    def _select_provider_key(self, symbol):
         symbol = symbol.upper()
         if "-USD" in symbol or "-BTC" in symbol or symbol.endswith("USDT"):
-            return self.providers['binance']
+            return 'binance'
         if ".TW" in symbol or ".TWO" in symbol:
-            return self.providers['tw']
-        return self.providers['yf']
+            return 'tw'
+        return 'yf'
+
+    def _select_provider(self, symbol):
+        return self.providers[self._select_provider_key(symbol)]
+
+    def _ranked_chain(self, key):
+        """斷路中的 provider 排到 failover 鏈後面，其餘維持設定順序。"""
+        chain = self.failover_chains[key]
+        return sorted(chain, key=lambda k: (self.breakers[k].health_key(), chain.index(k)))
+
+    def _fetch_quotes(self, key, symbols):
+        """
+        沿 failover 鏈取得原始報價，回傳 {symbol: (price, provider_key, is_stale)}。
+        每個 provider 有獨立逾時並回報斷路器；斷路中的 provider 直接跳過，不會卡住監控迴圈。
+        啟用對衝時，主要 provider 超過 p90 延遲未回應會同時查詢對衝對象，兩邊誰先回來就用誰。
+        """
+        results = {}
+        remaining = list(dict.fromkeys(symbols))
+        chain = list(self._ranked_chain(key))
+        while remaining and chain:
+            name = chain.pop(0)
+            if not self.breakers[name].allow():
+                continue
+            primary = self._submit_attempt(name, remaining)
+            attempts = {primary: name}
+            deadlines = {primary: time.monotonic() + self.provider_timeouts[name]}
+
+            delay = self._hedge_delay(name)
+            if delay is not None:
+                done, _ = wait(attempts, timeout=delay)
+                if not done:
+                    hedge = self._hedge_target(name, chain)
+                    if hedge is not None:
+                        if hedge in chain:
+                            chain.remove(hedge)
+                        future = self._submit_attempt(hedge, remaining, coalesce=hedge != name, hedged=True)
+                        attempts[future] = hedge
+                        # 對衝對象有自己的逾時：不因主要 provider 逾時而提早放棄，結果不會比不對衝時差
+                        deadlines[future] = time.monotonic() + self.provider_timeouts[hedge]
+
+            pending = set(attempts)
+            expired = set()
+            while pending and remaining:
+                now = time.monotonic()
+                expired |= {f for f in pending if deadlines[f] <= now and not f.done()}
+                pending -= expired
+                if not pending:
+                    break
+                done, pending = wait(pending, timeout=max(0.0, min(deadlines[f] for f in pending) - now),
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        print(f"{self.providers[attempts[future]].__class__.__name__} 失敗，改用下一個來源: "
+                              f"{future.exception()!r}")
+                        continue
+                    found = future.result()
+                    for symbol in remaining:
+                        if symbol in found:
+                            results[symbol] = (found[symbol], attempts[future], False)
+                    remaining = [s for s in remaining if s not in found]
+            for future in pending | expired:
+                # 逾時或對衝輸家：不再等待，結果由背景完成時自行回報斷路器
+                if not future.done():
+                    print(f"{self.providers[attempts[future]].__class__.__name__} 逾時，改用下一個來源")
+
+        for symbol in remaining:
+            results[symbol] = (self._last_known_price(symbol), None, True)
+        return results
+
+    def _submit_attempt(self, name, symbols, coalesce=True, hedged=False):
+        """
+        在執行緒池中向 provider 查詢，回傳 future，結果為 {symbol: price}（只含有效價格）。
+        延遲與成敗在完成時回報斷路器：只有例外 (連線錯誤、HTTP 錯誤) 與超過 provider_timeouts 才完成的呼叫記為失敗，
+        查無報價 (代號打錯、下市或沒有成交) 不算失敗，否則單一壞代號就會讓整個 provider 斷路。
+        coalesce=False 用於對同一 provider 的對衝，略過 single-flight 以免只是等待同一個請求。
+        """
+        provider = self.providers[name]
+        breaker = self.breakers[name]
+        timeout = self.provider_timeouts[name]
+        if not hedged:
+            self.hedge_budgets[name].record_request()
+
+        def attempt():
+            started = time.monotonic()
+            try:
+                if coalesce:
+                    prices = self._fetch_prices(provider, symbols)
+                else:
+                    prices = provider.get_prices(symbols)
+            except Exception:
+                breaker.record_failure(time.monotonic() - started)
+                raise
+            latency = time.monotonic() - started
+            found = {s: p for s, p in prices.items() if p is not None and p > 0}
+            if latency <= timeout:
+                breaker.record_success(latency)
+            else:
+                breaker.record_failure(latency)
+            return found
+
+        return self._provider_executor.submit(attempt)
+
+    def _hedge_delay(self, name):
+        """主要 provider 的對衝等待時間 (其 p90 延遲)；未啟用或樣本不足時回傳 None。"""
+        breaker = self.breakers[name]
+        if not self.hedging or breaker.sample_count < breaker.min_calls:
+            return None
+        delay = max(self.hedge_min_delay, breaker.latency_percentile(self.hedge_percentile))
+        return delay if delay < self.provider_timeouts[name] else None
+
+    def _hedge_target(self, name, chain):
+        """選出對衝對象：鏈上下一個可用的 provider，沒有則對同一 provider 重送；額度不足回傳 None。"""
+        if not self.hedge_budgets[name].try_spend():
+            return None
+        return next((k for k in chain if self.breakers[k].allow()), name)
+
+    def _tick_time(self, provider_key, symbol, price):
+        """推播報價的交易所成交時間；價格與 provider 最新 tick 相符時才採用，否則回傳 None (改用本地時間)。"""
+        if provider_key is None:
+            return None
+        tick = self.providers[provider_key].get_tick(symbol)
+        return tick[1] if tick and tick[0] == price else None
+
+    def _last_known_price(self, symbol):
+        with self.lock:
+            history = self.price_history.get(symbol)
+            return history.last_price() if history else None
+
+    def _submit_quotes(self, symbols):
+        """依 failover 鏈分組，每組在執行緒池中同時沿鏈抓取，回傳 [(group, future)]。"""
+        groups = {}
+        for symbol in dict.fromkeys(symbols):
+            groups.setdefault(self._select_provider_key(symbol), []).append(symbol)
+        return [(group, self._fanout_executor.submit(self._fetch_quotes, key, group)) for key, group in groups.items()]
+
+    def _collect_quotes(self, submitted):
+        """
+        等待 _submit_quotes 的結果，回傳 {symbol: (price, provider_key, is_stale)}。
+        新報價經過清洗並寫入歷史，stale 的快取價則原樣回傳。
+        """
+        results = {}
+        for group, future in submitted:
+            try:
+                quotes = future.result()
+            except Exception as e:
+                print(f"MarketDataAgent Error ({','.join(group)}): {e}")
+                quotes = {}
+            for symbol in group:
+                price, source, stale = quotes.get(symbol, (None, None, True))
+                if not stale:
+                    price = self._clean_data(symbol, price, self._tick_time(source, symbol, price))
+                results[symbol] = (price, source, stale)
+        return results
+
+    def _is_market_open(self, symbol):
+        # 開盤狀態只是交易所日曆的本地查表，直接計算
+        try:
+            return self._select_provider(symbol).is_market_open(symbol)
+        except Exception as e:
+            print(f"MarketDataAgent Error (is_open {symbol}): {e}")
+            return None
 
     def get_market_data(self, symbol):
+        """報價、名稱、開盤狀態，名稱查詢與報價同時進行。"""
+        return self.get_market_data_many([symbol])[symbol]
+
+    def get_market_data_many(self, symbols):
+        """
+        同時抓取多檔完整行情，回傳 {symbol: market_data}；一輪耗時取決於最慢的 provider，而不是全部相加。
+        名稱查詢與報價並行，最多再等到報價使用的 provider 中最長的逾時，逾時則先以代號顯示。
+        """
+        symbols = list(dict.fromkeys(symbols))
+        started = time.monotonic()
+        metadata_future = self._fanout_executor.submit(self.get_metadata_many, symbols)
+        quotes = self._collect_quotes(self._submit_quotes(symbols))
+        timeout = max(self.provider_timeouts[self._select_provider_key(s)] for s in symbols) if symbols else 0.0
+        try:
+            metadata = metadata_future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+        except Exception as e:
+            print(f"MarketDataAgent Error (metadata {','.join(symbols)}): {e!r}")
+            metadata = {}
+
+        results = {}
+        for symbol in symbols:
+            meta = metadata.get(symbol)
+            price, source, stale = quotes[symbol]
+            provider = self.providers[source] if source else self._select_provider(symbol)
+            results[symbol] = {
+                'symbol': symbol,
+                'name': meta['name'] if meta else symbol,
+                'price': price,
+                'stale': stale,
+                'currency': meta.get('currency') if meta else None,
+                'exchange': meta.get('exchange') if meta else None,
+                'is_open': self._is_market_open(symbol),
+                'provider': provider.__class__.__name__
+            }
+        return results
+
+    def poll_interval(self, symbol, base_interval):
+        """依 provider 的限流狀態拉長輪詢間隔，限流解除後自動恢復。"""
+        limiter = self._select_provider(symbol).rate_limiter
+        return limiter.interval(base_interval) if limiter else base_interval
+
+    def next_market_open(self, symbol):
+        """下一次開盤時間 (aware datetime)，全天候交易的市場回傳 None。"""
+        calendar = self._select_provider(symbol).get_calendar(symbol)
+        return calendar.next_open() if calendar else None
+
+    def subscribe_ticks(self, symbol, callback):
+        """
+        訂閱推播成交：provider 支援推播時，每筆成交呼叫 callback(symbol, price, 交易所成交時間) 並回傳 True；
+        不支援推播 (REST 輪詢型) 時回傳 False，呼叫端應維持輪詢。
+        """
         provider = self._select_provider(symbol)
-        price = provider.get_price(symbol)
-        name = provider.get_name(symbol)
-        is_open = provider.is_market_open(symbol)
-        
-        cleaned_price = self._clean_data(symbol, price)
-        
-        return {
-            'symbol': symbol,
-            'name': name,
-            'price': cleaned_price,
-            'is_open': is_open,
-            'provider': provider.__class__.__name__
-        }
+        if not provider.supports_push:
+            return False
+        provider.add_tick_listener(symbol, callback)
+        return True
 
-    def _clean_data(self, symbol, new_price):
+    def unsubscribe_ticks(self, symbol, callback):
+        provider = self._select_provider(symbol)
+        if provider.supports_push:
+            provider.remove_tick_listener(symbol, callback)
+
+    def unwatch(self, symbol):
+        """停止追蹤某代號（例如使用者切換監控標的），讓推播型 provider 退訂。"""
+        provider = self._select_provider(symbol)
+        if hasattr(provider, 'unsubscribe'):
+            provider.unsubscribe([symbol])
+
+    def get_metadata(self, symbol):
+        """取得代號基本資料，首次查詢後由快取（記憶體 + 磁碟）直接命中。"""
+        provider = self._select_provider(symbol)
+        return self.metadata_cache.get_or_fetch(provider.__class__.__name__, symbol, provider.get_metadata)
+
+    def get_metadata_many(self, symbols):
+        """批次取得基本資料：先查快取，未命中的代號依 provider 分組，每組只發一次批量查詢。"""
+        results = {}
+        misses = {} # {provider key: [symbol]}
+        for symbol in dict.fromkeys(symbols):
+            key = self._select_provider_key(symbol)
+            metadata = self.metadata_cache.get(self.providers[key].__class__.__name__, symbol)
+            if metadata is None:
+                misses.setdefault(key, []).append(symbol)
+            else:
+                results[symbol] = metadata
+        for key, group in misses.items():
+            provider = self.providers[key]
+            fetched = provider.get_metadata_many(group)
+            self.metadata_cache.put_many(provider.__class__.__name__,
+                                         {symbol: meta for symbol, meta in fetched.items() if meta})
+            for symbol in group:
+                results[symbol] = fetched.get(symbol)
+        return results
+
+    def backfill(self, symbol, minutes=None):
+        """
+        啟用代號時以一次批量請求載入最近的 1 分 K，預先填入歷史與閃崩統計，
+        讓偵測從第一筆即時報價就能運作。已有足夠新的歷史時略過，回傳寫入筆數。
+        """
+        if minutes is None:
+            minutes = int(self.history_horizon_seconds // 60)
+        with self.lock:
+            history = self.price_history.get(symbol)
+            if history and time.time() - history.timestamp_at(-1) < self.history_horizon_seconds:
+                return 0
+
+        points = self._select_provider(symbol).get_history(symbol, minutes)
+        return self.ingest_history(symbol, points)
+
+    def hold_ticks(self, symbol):
+        """
+        開始補齊 symbol 的歷史：之後的即時報價仍照常回傳，但先暫存不寫入，
+        直到 ingest_history 寫入補齊的資料後才依序寫入，避免新報價搶先寫入而讓補齊的舊資料被略過。
+        """
+        with self.lock:
+            self._held_ticks.setdefault(symbol, [])
+
+    def ingest_history(self, symbol, points):
+        """
+        將歷史報價 [(timestamp, price)] 依時間順序寫入，略過無效值及早於現有資料的點；
+        之後寫入 hold_ticks 期間暫存的即時報價並解除暫存。回傳寫入的歷史筆數。
+        """
+        count = 0
+        with self.lock:
+            history = self.price_history.get(symbol)
+            if history is None:
+                history = self.price_history[symbol] = PriceRingBuffer.for_horizon(
+                    self.history_horizon_seconds, self.max_ticks_per_second)
+            last_ts = history.timestamp_at(-1) if history else float("-inf")
+            for timestamp, price in sorted(points):
+                if price is None or price <= 0 or timestamp <= last_ts:
+                    continue
+                self._record(symbol, history, timestamp, price)
+                last_ts = timestamp
+                count += 1
+            for timestamp, price in self._held_ticks.pop(symbol, ()):
+                self._clean_locked(symbol, price, timestamp)
+        return count
+
+    def _fetch_prices(self, provider, symbols):
+        """向 provider 取得原始報價 {symbol: price}，經過 single-flight 合併。"""
+        name = provider.__class__.__name__
+        return self._flight.do_many(name, symbols, provider.get_prices, self.quote_freshness.get(name, 1.0))
+
+    def get_prices(self, symbols):
+        """
+        批次取得多檔報價：依 provider 分組，每組只發一次批量請求且各組同時進行，
+        回傳經過清洗的 {symbol: price}。
+        """
+        quotes = self._collect_quotes(self._submit_quotes(symbols))
+        return {symbol: quote[0] for symbol, quote in quotes.items()}
+
+    def _clean_data(self, symbol, new_price, ts=None):
+        """
+        清洗並記錄一筆報價。ts 為交易所成交時間 (未提供時用本地時間)，
+        早於最後一筆的時間會被夾到最後一筆，確保歷史時間軸單調遞增。
+        """
         if new_price is None or new_price <= 0:
             return None
-        
         with self.lock:
-            if symbol not in self.price_history:
-                self.price_history[symbol] = []
-                self.price_history[symbol].append((time.time(), new_price))
-                return new_price
-            
-            history = self.price_history[symbol]
-            if not history:
-                history.append((time.time(), new_price))
-                return new_price
-            
-            last_price = history[-1][1]
-            
-            # 數據清洗：如果變動超過 50%，視為異常跳變，除非連續出現。模擬模式下跳過清洗。
-            if not self.simulation_mode and abs(new_price - last_price) / last_price > 0.5:
-                # 檢查是否連續第二次出現類似價格，如果是，可能真的是大變動
-                if len(history) >= 2 and abs(new_price - history[-2][1]) / history[-2][1] > 0.5:
-                    pass # 連續兩次異常，可能真的是市場變動
-                else:
-                    print(f"DEBUG: Detected outlier for {symbol}: {last_price} -> {new_price}. Filtering.")
-                    return last_price # 回傳舊價格
-            
-            history.append((time.time(), new_price))
-            # 只保留最近 100 筆
-            if len(history) > 100:
-                history.pop(0)
-            
+            return self._clean_locked(symbol, new_price, ts)
+
+    def _clean_locked(self, symbol, new_price, ts=None):
+        """_clean_data 的本體，呼叫端需持有 self.lock。"""
+        timestamp = time.time() if ts is None else ts
+        held = self._held_ticks.get(symbol)
+        if held is not None:
+            # 補齊歷史中：先暫存 (依 max_ticks_per_second 降採樣)，補齊後再寫入
+            if not held or timestamp - held[-1][0] >= 1.0 / self.max_ticks_per_second:
+                held.append((timestamp, new_price))
+            return new_price
+
+        history = self.price_history.get(symbol)
+        if history is None:
+            history = self.price_history[symbol] = PriceRingBuffer.for_horizon(
+                self.history_horizon_seconds, self.max_ticks_per_second)
+
+        if not history:
+            self._record(symbol, history, timestamp, new_price)
             return new_price
+        
+        last_price = history.price_at(-1)
+        last_ts = history.timestamp_at(-1)
+        if ts is not None and ts <= last_ts and new_price == last_price:
+            return new_price # 同一筆成交被重複輪詢，不重複記錄
+        timestamp = max(timestamp, last_ts)
+        
+        # 數據清洗：如果變動超過 50%，視為異常跳變，除非連續出現。模擬模式下跳過清洗。
+        if not self.simulation_mode and abs(new_price - last_price) / last_price > 0.5:
+            # 檢查是否連續第二次出現類似價格，如果是，可能真的是大變動
+            if len(history) >= 2 and abs(new_price - history.price_at(-2)) / history.price_at(-2) > 0.5:
+                pass # 連續兩次異常，可能真的是市場變動
+            else:
+                print(f"DEBUG: Detected outlier for {symbol}: {last_price} -> {new_price}. Filtering.")
+                return last_price # 回傳舊價格
+        
+        # 超過保留時間的資料會在寫入時淘汰
+        self._record(symbol, history, timestamp, new_price)
+        
+        return new_price
+
+    def ingest_tick(self, symbol, price, ts):
+        """
+        推播成交：依 max_ticks_per_second 降採樣寫入歷史 (高頻成交不會把保留的時間跨度擠短)，
+        間隔太近的成交只回傳價格供即時判斷，不寫入。
+        """
+        with self.lock:
+            history = self.price_history.get(symbol)
+            if history and ts - history.timestamp_at(-1) < 1.0 / self.max_ticks_per_second:
+                return price
+        return self._clean_data(symbol, price, ts)
+
+    def _record(self, symbol, history, timestamp, price):
+        """寫入歷史並同步更新閃崩偵測器的增量統計 (偵測器直接讀取同一個緩衝區，呼叫端需持有 self.lock)。"""
+        detector = self._detectors.get(symbol)
+        if detector is None:
+            detector = self._detectors[symbol] = FlashCrashDetector(history, self.crash_windows, self.baseline_seconds)
+        detector.before_append()
+        history.append(timestamp, price)
+        detector.update()
 
     def detect_flash_crash(self, symbol, current_price):
         """
         閃崩演算法：
-        使用最近 5 分鐘的數據，計算 Z-score 或實質跌幅速度。
+        一次檢查多個時間框架 (預設 10 秒 / 1 分鐘 / 5 分鐘 / 15 分鐘)，各自有跌幅門檻；
+        短視窗另需最近 5 分鐘 (baseline_seconds) 的 Z-score 確認。
+        回傳觸發的訊號 dict（含 window、drop_rate、velocity），未觸發回傳 None。
         """
         with self.lock:
-            if symbol not in self.price_history or len(self.price_history[symbol]) < 5:
-                return None
-            
-            history = self.price_history[symbol]
-            now = time.time()
-            # 取得最近 1 分鐘的數據
-            one_min_data = [p for t, p in history if now - t <= 60]
-            
-            if len(one_min_data) < 3:
+            detector = self._detectors.get(symbol)
+            if detector is None:
                 return None
-            
-            # 實質跌幅檢查 (1 分鐘內跌超過 1.5%)
-            price_start = one_min_data[0]
-            drop_rate = (price_start - current_price) / price_start
-            
-            if drop_rate >= 0.015:
-                # 進一步計算 Z-score 增加精確度
-                prices = [p for t, p in history]
-                if len(prices) >= 2:
-                    mean = statistics.mean(prices)
-                    std = statistics.stdev(prices)
-                    if std > 0:
-                        z_score = (current_price - mean) / std
-                        print(f"DEBUG FlashCrash: Price={current_price}, Mean={mean:.2f}, Std={std:.2f}, Z={z_score:.2f}, Drop={drop_rate*100:.1f}%")
-                        if z_score < -2.0: 
-                            return drop_rate
-            
-            return None
+            signal = detector.evaluate(current_price)
+
+        if signal:
+            z_text = f"{signal['z_score']:.2f}" if signal['z_score'] is not None else "N/A"
+            print(f"DEBUG FlashCrash: Price={current_price}, Window={signal['window']}s, Drop={signal['drop_rate']*100:.1f}%, "
+                  f"Velocity={signal['velocity']*100:.2f}%/min, Z={z_text}, EWMA Vol={signal['ewma_volatility']*100:.2f}%")
+        return signal
@@ -0,0 +1,90 @@
+from core.history import RollingWindowStats
+
+# (視窗秒數, 跌幅門檻, 最少樣本數, 是否需要 Z-score 確認)
+# 短視窗抓急跌插針，需要 Z-score 過濾雜訊；長視窗抓緩跌，基準會跟著下移，所以只看跌幅。
+DEFAULT_CRASH_WINDOWS = (
+    (10, 0.010, 3, True),
+    (60, 0.015, 3, True),
+    (300, 0.030, 5, False),
+    (900, 0.050, 5, False),
+)
+
+class FlashCrashDetector:
+    """
+    多時間框架閃崩偵測器（每個代號一個實例）。
+    所有視窗共用該代號的 PriceRingBuffer，各自只記錄起訖序號，不複製歷史資料；
+    緩衝區每寫入一筆後呼叫一次 update()，所有視窗的統計量一起增量更新；
+    evaluate() 以單次迴圈檢查所有視窗，回傳最短的觸發視窗及其跌速。
+    同一波閃崩只通報一次：記錄已通報的高點，之後只有出現新高點 (新的一波)
+    或從上次通報價再跌 rearm_drop 以上才會再次觸發，避免長視窗在整段保留時間內反覆通報。
+    """
+    def __init__(self, buffer, windows=DEFAULT_CRASH_WINDOWS, baseline_seconds=300, z_threshold=-2.0, min_baseline_samples=5,
+                 rearm_drop=0.01):
+        self.buffer = buffer
+        self.rearm_drop = rearm_drop
+        self.windows = sorted(windows)
+        self.z_threshold = z_threshold
+        self.min_baseline_samples = min_baseline_samples
+        self._baseline = RollingWindowStats(buffer, baseline_seconds)
+        # 各時間框架只需要視窗最高價與樣本數，不維護平均數 / 變異數
+        self._stats = [RollingWindowStats(buffer, spec[0], moments=False) for spec in self.windows]
+        self._last_timestamp = None
+        self._fired_peak_time = None # 上次通報時的視窗高點時間
+        self._fired_price = None     # 上次通報時的價格
+
+    def before_append(self):
+        """緩衝區寫滿時下一筆會覆蓋最舊的資料，先讓各視窗把它移出統計。"""
+        seq = self.buffer.end_seq - self.buffer.capacity + 1
+        self._baseline.release(seq)
+        for stats in self._stats:
+            stats.release(seq)
+
+    def update(self):
+        """納入緩衝區新寫入的資料。"""
+        if self.buffer.end_seq:
+            self._last_timestamp = self.buffer.timestamp_at_seq(self.buffer.end_seq - 1)
+        self._baseline.update()
+        for stats in self._stats:
+            stats.update()
+
+    @property
+    def sample_count(self):
+        return self._baseline.count
+
+    def evaluate(self, current_price, now=None):
+        """
+        回傳觸發訊號 dict 或 None (觸發後即記為已通報)：
+        {'window': 秒數, 'drop_rate': 從視窗高點的跌幅, 'velocity': 每分鐘跌幅, 'z_score': Z 值或 None}
+        """
+        baseline = self._baseline
+        if baseline.count < self.min_baseline_samples:
+            return None
+        if now is None:
+            now = self._last_timestamp
+
+        std = baseline.std
+        z_score = (current_price - baseline.mean) / std if std > 0 else None
+
+        for (seconds, threshold, min_samples, require_z), stats in zip(self.windows, self._stats):
+            if stats.count < min_samples:
+                continue
+            peak = stats.window_max
+            drop_rate = (peak - current_price) / peak
+            if drop_rate < threshold:
+                continue
+            if require_z and (z_score is None or z_score >= self.z_threshold):
+                continue
+            if stats.window_max_time == self._fired_peak_time and \
+                    current_price > self._fired_price * (1 - self.rearm_drop):
+                continue # 同一個高點起算的跌幅已通報過，且沒有進一步下跌
+            self._fired_peak_time = stats.window_max_time
+            self._fired_price = current_price
+            elapsed = max(now - stats.window_max_time, 1.0)
+            return {
+                'window': seconds,
+                'drop_rate': drop_rate,
+                'velocity': drop_rate / elapsed * 60,
+                'z_score': z_score,
+                'ewma_volatility': baseline.ewma_volatility
+            }
+        return None
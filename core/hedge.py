@@ -0,0 +1,29 @@
+import threading
+
+class HedgeBudget:
+    """
+    對衝請求 (hedged request) 的額度：每送出一次主要請求累積 ratio 個 token，
+    每次對衝花費 1 個，最多存 burst 個。對衝造成的額外流量因此不會超過主要請求的 ratio 倍，
+    上游整體變慢時也不會因為大量對衝而雪上加霜。
+    """
+    def __init__(self, ratio=0.1, burst=3.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self):
+        """額度足夠則扣除並回傳 True。"""
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            self.hedges += 1
+            return True
@@ -0,0 +1,220 @@
+import bisect
+import math
+from array import array
+from collections import deque
+
+class PriceRingBuffer:
+    """
+    固定容量的價格環形緩衝區，時間戳與價格分別存放在兩個 array('d') 欄位。
+
+    採用「鏡像寫入」：實體陣列長度為 2 * capacity，每筆資料同時寫入 i 與 i + capacity，
+    因此任何邏輯區間在實體陣列上都是連續的，可以直接回傳 memoryview 切片（零複製）。
+    注意：回傳的 view 會隨後續寫入而變動，呼叫端需在持有外部鎖時使用。
+
+    horizon_seconds 設定時，比最新一筆早超過 horizon 的資料會在寫入時被淘汰，
+    capacity 則是依 horizon 與最高 tick 頻率推得的記憶體上限。
+    """
+    def __init__(self, capacity=100, horizon_seconds=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self.horizon_seconds = horizon_seconds
+        self._ts = array('d', bytes(16 * capacity))
+        self._px = array('d', bytes(16 * capacity))
+        self._start = 0
+        self._size = 0
+        self._end = 0 # 下一筆的序號；序號 seq 的資料位於實體索引 seq % capacity
+
+    @classmethod
+    def for_horizon(cls, horizon_seconds, max_ticks_per_second):
+        """依保留時間長度與最高 tick 頻率建立緩衝區。"""
+        capacity = max(1, math.ceil(horizon_seconds * max_ticks_per_second))
+        return cls(capacity=capacity, horizon_seconds=horizon_seconds)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, price):
+        """寫入一筆資料，滿了就覆蓋最舊的一筆 (O(1)，不配置新物件)。"""
+        cap = self.capacity
+        if self._size < cap:
+            idx = (self._start + self._size) % cap
+            self._size += 1
+        else:
+            idx = self._start
+            self._start = (self._start + 1) % cap
+        self._ts[idx] = self._ts[idx + cap] = timestamp
+        self._px[idx] = self._px[idx + cap] = price
+        self._end += 1
+
+        if self.horizon_seconds is not None:
+            cutoff = timestamp - self.horizon_seconds
+            while self._size > 1 and self._ts[self._start] < cutoff:
+                self._start = (self._start + 1) % cap
+                self._size -= 1
+
+    def clear(self):
+        self._start = self._end % self.capacity
+        self._size = 0
+
+    @property
+    def head_seq(self):
+        """最舊一筆 (仍在保留時間內) 的序號。"""
+        return self._end - self._size
+
+    @property
+    def end_seq(self):
+        """下一筆將寫入的序號；最新一筆為 end_seq - 1。"""
+        return self._end
+
+    def _seq_index(self, seq):
+        # 被 horizon 淘汰但尚未被覆蓋的資料仍可讀取，供各視窗的增量統計扣除
+        if not self._end - self.capacity <= seq < self._end:
+            raise IndexError("PriceRingBuffer sequence overwritten or not yet written")
+        return seq % self.capacity
+
+    def price_at_seq(self, seq):
+        return self._px[self._seq_index(seq)]
+
+    def timestamp_at_seq(self, seq):
+        return self._ts[self._seq_index(seq)]
+
+    def _physical(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("PriceRingBuffer index out of range")
+        return self._start + i
+
+    def price_at(self, i):
+        """依邏輯索引取價格，支援負索引（-1 為最新一筆）。"""
+        return self._px[self._physical(i)]
+
+    def timestamp_at(self, i):
+        return self._ts[self._physical(i)]
+
+    def last_price(self):
+        return self.price_at(-1) if self._size else None
+
+    def timestamps(self):
+        """全部時間戳的零複製 view（由舊到新）。"""
+        return memoryview(self._ts)[self._start:self._start + self._size]
+
+    def prices(self):
+        """全部價格的零複製 view（由舊到新）。"""
+        return memoryview(self._px)[self._start:self._start + self._size]
+
+    def window(self, since):
+        """回傳時間戳 >= since 的 (timestamps, prices) 零複製 view，以二分搜尋定位起點。"""
+        ts = self.timestamps()
+        first = bisect.bisect_left(ts, since)
+        return ts[first:], self.prices()[first:]
+
+class RollingWindowStats:
+    """
+    共用 PriceRingBuffer 上的時間視窗增量統計，每筆 tick 攤銷 O(1) 更新。
+    不另外複製價格：只記錄視窗的起訖序號，新資料與淘汰的資料都直接從緩衝區欄位讀取。
+    - 單調遞減 deque 保存視窗內最高價候選的序號（作為跌幅的起算價）
+    - moments=True 時以 Welford 演算法維護平均數 / 變異數（移出視窗的資料反向扣除），並以 EWMA 維護報酬率波動度
+    """
+    def __init__(self, buffer, window_seconds, moments=True, ewma_alpha=0.06):
+        self.buffer = buffer
+        self.window_seconds = window_seconds
+        self.moments = moments
+        self.ewma_alpha = ewma_alpha
+        self._start = buffer.end_seq # 視窗內最舊一筆的序號
+        self._end = buffer.end_seq   # 已納入統計的下一筆序號
+        self._max = deque()
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._last_price = None
+        self._ewma_var = 0.0
+
+    def update(self):
+        """納入緩衝區新寫入的資料，並淘汰視窗外的資料。"""
+        buf = self.buffer
+        while self._end < buf.end_seq:
+            self._add(self._end, buf.price_at_seq(self._end))
+            self._end += 1
+        if self._end == self._start:
+            return
+        cutoff = buf.timestamp_at_seq(self._end - 1) - self.window_seconds
+        while self._start < self._end and buf.timestamp_at_seq(self._start) < cutoff:
+            self._evict()
+
+    def release(self, seq):
+        """強制淘汰序號 < seq 的資料；緩衝區寫滿、即將覆蓋最舊一筆前呼叫。"""
+        while self._start < min(seq, self._end):
+            self._evict()
+
+    def _add(self, seq, price):
+        if self.moments:
+            # 1. EWMA 報酬率波動度
+            if self._last_price:
+                ret = (price - self._last_price) / self._last_price
+                self._ewma_var = (1 - self.ewma_alpha) * self._ewma_var + self.ewma_alpha * ret * ret
+            self._last_price = price
+
+            # 2. Welford 加入新值
+            self._n += 1
+            delta = price - self._mean
+            self._mean += delta / self._n
+            self._m2 += delta * (price - self._mean)
+        else:
+            self._n += 1
+
+        # 3. 單調 deque：移除所有不大於新價格的尾端候選
+        buf = self.buffer
+        while self._max and buf.price_at_seq(self._max[-1]) <= price:
+            self._max.pop()
+        self._max.append(seq)
+
+    def _evict(self):
+        seq = self._start
+        self._start += 1
+        if self._max and self._max[0] == seq:
+            self._max.popleft()
+        if not self.moments:
+            self._n -= 1
+            return
+        # Welford 反向更新：把移出視窗的值從平均數與平方和中扣除
+        price = self.buffer.price_at_seq(seq)
+        if self._n <= 1:
+            self._n = 0
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = price - self._mean
+        self._mean -= delta / (self._n - 1)
+        self._m2 = max(0.0, self._m2 - delta * (price - self._mean))
+        self._n -= 1
+
+    @property
+    def count(self):
+        return self._n
+
+    @property
+    def mean(self):
+        return self._mean if self._n else None
+
+    @property
+    def variance(self):
+        """樣本變異數（與 statistics.variance 相同的 n - 1 分母）。"""
+        return self._m2 / (self._n - 1) if self._n >= 2 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def window_max(self):
+        return self.buffer.price_at_seq(self._max[0]) if self._max else None
+
+    @property
+    def window_max_time(self):
+        return self.buffer.timestamp_at_seq(self._max[0]) if self._max else None
+
+    @property
+    def ewma_volatility(self):
+        return math.sqrt(self._ewma_var)
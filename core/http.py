@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+# (連線逾時, 讀取逾時)：連線逾時略大於 3 秒的 TCP 重傳間隔
+DEFAULT_TIMEOUT = (3.05, 5)
+
+# 各主機的連線池大小（keep-alive 連線數上限）
+HOST_POOL_SIZES = {
+    "https://api.binance.com": 4,
+    "https://query1.finance.yahoo.com": 8,
+    "https://mis.twse.com.tw": 4,
+}
+
+RETRY_STATUS = {500, 502, 503, 504}
+
+class UpstreamError(Exception):
+    """上游服務回應錯誤狀態碼 (整批請求失敗)，與「查無此代號」區分。"""
+
+class HttpClient:
+    """
+    所有 REST provider 共用的 HTTP 連線層：
+    - requests.Session + HTTPAdapter 連線池，重用 TCP/TLS 連線 (keep-alive)
+    - 依主機設定連線池大小
+    - 連線錯誤、逾時與 5xx 以指數退避 + 隨機抖動 (jitter) 重試
+    urllib3 連線池本身是執行緒安全的；這裡只發送無 cookie 狀態的 GET，可跨執行緒共用同一個 Session。
+    """
+    def __init__(self, pool_sizes=None, default_pool_size=10, retries=2, backoff=0.25, timeout=DEFAULT_TIMEOUT):
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = "Mozilla/5.0 (SmartStockLight)"
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=default_pool_size))
+        self.session.mount("http://", HTTPAdapter(pool_connections=10, pool_maxsize=default_pool_size))
+        for prefix, size in (HOST_POOL_SIZES if pool_sizes is None else pool_sizes).items():
+            self.session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=size))
+
+    def get(self, url, params=None, timeout=None, retries=None, headers=None, limiter=None):
+        """
+        發送 GET，可重試的錯誤會自動退避重試；最後一次仍失敗時回傳該回應或拋出例外。
+        傳入 limiter (AdaptiveRateLimiter) 時，每次送出前先取得額度，並以回應調整速率。
+        """
+        retries = self.retries if retries is None else retries
+        timeout = timeout or self.timeout
+        for attempt in range(retries + 1):
+            try:
+                if limiter:
+                    limiter.acquire(timeout=timeout[0] if isinstance(timeout, tuple) else timeout)
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+                if limiter:
+                    limiter.on_response(response.status_code, response.headers)
+                if response.status_code in RETRY_STATUS and attempt < retries:
+                    self._sleep_backoff(attempt)
+                    continue
+                return response
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+                self._sleep_backoff(attempt)
+
+    def _sleep_backoff(self, attempt):
+        time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client():
+    """取得全域共用的 HttpClient（延遲建立）。"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,87 @@
+import threading
+import time
+from core.sessions import calendar_for_symbol
+from core.yahoo_chart import YahooChartClient
+
+DEFAULT_INDICES = ("^TWII", "^GSPC", "^IXIC")
+
+class MarketIndexService(threading.Thread):
+    """
+    大盤指數背景輪詢服務：只在各指數所屬交易所開盤時，依 interval 秒輪詢一次；
+    休市時只在啟動時抓一次收盤價，之後睡到下一次開盤。
+    監控迴圈與 Web API 只讀取快取，不再在每一輪呼叫 Yahoo。
+    """
+    def __init__(self, indices=DEFAULT_INDICES, client=None, interval=30.0, max_sleep=300.0):
+        super().__init__(name="market-index", daemon=True)
+        self.indices = tuple(indices)
+        self.client = client or YahooChartClient()
+        self.interval = interval
+        self.max_sleep = max_sleep # 休市期間最長睡眠，避免時鐘或假日表變動後錯過開盤
+        self._snapshots = {} # {symbol: {'price', 'prev_close', 'change', 'change_pct', 'is_open', 'updated'}}
+        self._next_due = {symbol: 0.0 for symbol in self.indices}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def get(self, symbol):
+        with self._lock:
+            snapshot = self._snapshots.get(symbol)
+            return dict(snapshot) if snapshot else None
+
+    def snapshot(self):
+        """所有指數的快取 {symbol: snapshot}（尚未抓到的指數不會出現）。"""
+        with self._lock:
+            return {symbol: dict(values) for symbol, values in self._snapshots.items()}
+
+    def due_indices(self, now=None):
+        now = time.time() if now is None else now
+        return [symbol for symbol in self.indices if self._next_due[symbol] <= now]
+
+    def refresh(self, symbols=None):
+        """抓取指定 (預設為到期的) 指數並更新快取與下一次輪詢時間，回傳實際更新的代號。"""
+        now = time.time()
+        symbols = self.due_indices(now) if symbols is None else list(symbols)
+        if not symbols:
+            return []
+        try:
+            quotes = self.client.get_quotes(symbols)
+        except Exception as e:
+            print(f"MarketIndexService Error: {e}")
+            quotes = {}
+        for symbol in symbols:
+            calendar = calendar_for_symbol(symbol)
+            is_open = calendar.is_open()
+            quote = quotes.get(symbol)
+            if quote:
+                price, prev_close = quote['price'], quote['prev_close']
+                change = price - prev_close if prev_close else None
+                with self._lock:
+                    self._snapshots[symbol] = {
+                        'price': price,
+                        'prev_close': prev_close,
+                        'change': change,
+                        'change_pct': change / prev_close * 100 if change is not None else None,
+                        'is_open': is_open,
+                        'updated': now
+                    }
+            self._next_due[symbol] = self._next_poll(symbol, calendar, is_open, quote is not None, now)
+        return [s for s in symbols if s in quotes]
+
+    def _next_poll(self, symbol, calendar, is_open, fetched, now):
+        if is_open or not fetched:
+            # 交易中或尚未取得收盤價：依固定間隔 (失敗時也是) 再抓
+            return now + self.interval
+        seconds = calendar.seconds_until_open()
+        # 開盤後稍等一個間隔再抓，讓第一筆成交反映到指數
+        return now + (seconds + self.interval if seconds is not None else self.max_sleep)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"大盤指數更新失敗: {e}")
+            wait = min(self._next_due.values()) - time.time() if self._next_due else self.max_sleep
+            self._stop_event.wait(min(self.max_sleep, max(1.0, wait)))
+
+    def stop(self):
+        self._stop_event.set()
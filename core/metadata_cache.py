@@ -0,0 +1,99 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class SymbolMetadataCache:
+    """
+    代號基本資料（名稱、幣別、交易所）快取。
+    - TTL：超過 ttl_seconds 的項目視為過期，會重新查詢。
+    - LRU：超過 max_entries 時淘汰最久未使用的項目。
+    - 持久化：寫入 JSON 檔，重啟後仍可直接從記憶體命中。
+    """
+    def __init__(self, cache_file="symbol_cache.json", ttl_seconds=7 * 24 * 3600, max_entries=512):
+        self._cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # {key: {"metadata": {...}, "fetched_at": ts}}
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def _key(namespace, symbol):
+        return f"{namespace}:{symbol.upper()}"
+
+    def _load(self):
+        """從檔案讀取快取，略過已過期的項目"""
+        if not self._cache_file or not os.path.exists(self._cache_file):
+            return
+        try:
+            with open(self._cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            for key, entry in data.items():
+                if now - entry.get("fetched_at", 0) < self.ttl_seconds:
+                    self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        except Exception as e:
+            print(f"⚠️ 讀取代號快取失敗: {e}")
+
+    def _save(self):
+        """寫入快取到檔案（呼叫端需持有鎖）"""
+        if not self._cache_file:
+            return
+        try:
+            with open(self._cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"❌ 儲存代號快取失敗: {e}")
+
+    def get(self, namespace, symbol):
+        """回傳未過期的 metadata dict，未命中時回傳 None"""
+        key = self._key(namespace, symbol)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["fetched_at"] >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry["metadata"]
+
+    def put(self, namespace, symbol, metadata):
+        key = self._key(namespace, symbol)
+        with self._lock:
+            self._entries[key] = {"metadata": metadata, "fetched_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def put_many(self, namespace, items):
+        """整批寫入 {symbol: metadata}，只存檔一次。"""
+        if not items:
+            return
+        with self._lock:
+            now = time.time()
+            for symbol, metadata in items.items():
+                key = self._key(namespace, symbol)
+                self._entries[key] = {"metadata": metadata, "fetched_at": now}
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def get_or_fetch(self, namespace, symbol, fetch):
+        """
+        先查快取，未命中才呼叫 fetch(symbol)。
+        fetch 回傳 None（查詢失敗）時不寫入快取，下次會再嘗試。
+        """
+        metadata = self.get(namespace, symbol)
+        if metadata is not None:
+            return metadata
+        metadata = fetch(symbol)
+        if metadata:
+            self.put(namespace, symbol, metadata)
+        return metadata
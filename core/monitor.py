@@ -1,9 +1,11 @@
 import time
 import threading
-import yfinance as yf
 import subprocess
 from datetime import datetime
 from core.data_agent import MarketDataAgent
+from core.market_index import MarketIndexService
+from core.watchlist import Watchlist
+from core.scheduler import PollScheduler
 
 class StockMonitor(threading.Thread):
     def __init__(self, shared_config, tapo_controller):
@@ -23,8 +25,6 @@ class StockMonitor(threading.Thread):
         # 數據緩存
         self.last_stock_price = None
         self.last_stock_name = "監控中..."
-        self.last_market_index = None
-        self.last_market_change = None
         self.last_update_time = "尚未更新"
         self.device_off = False  # 追蹤硬體是否被使用者手動關閉
         self.alert_mode = None   # 'above' 或 'below'，自動判定
@@ -33,7 +33,21 @@ class StockMonitor(threading.Thread):
         self.alarm_thread = None   # 警報播報執行緒
         self.mock_current_price = None  # 用於自動化測試模擬數據
         self.data_agent = MarketDataAgent() # 新增：行情監控代理
+        self.market_index = MarketIndexService() # 大盤指數：背景依交易時段輪詢，監控迴圈只讀快取
         self.last_color_state = None # 新增：追蹤上次發送的燈光顏色
+        self._closed_symbol = None # 已記錄休市訊息的代號，避免休市期間重複寫日誌
+        self._stale_logged = False # 是否已記錄「報價來源中斷」訊息
+        self.watchlist = Watchlist(self.cooldown_seconds) # 監控清單模式：每個代號各自的目標價、停損與冷卻狀態
+        self.scheduler = PollScheduler() # 監控清單的輪詢排程：每個代號依市場與開盤狀態有自己的到期時間
+        # 推播模式：支援推播的 provider (Binance) 每筆成交喚醒監控迴圈，不再固定間隔輪詢
+        self.push_mode = not self.simulation_mode
+        self.push_timeout = 5 # 超過 5 秒沒有成交時改走一般輪詢 (含 REST 補救)
+        self._push_symbol = None
+        self._latest_tick = None # (price, 交易所成交時間)
+        self._tick_event = threading.Event()
+        self._last_status_log = 0.0
+        self._speech_thread = None # 背景語音播報執行緒，監控迴圈不等待朗讀完成
+        self._color_hold_until = 0.0 # 監控清單模式：閃崩紫燈至少維持到此時間才回到黃燈
         
         # 初始化 TTS 元件
         try:
@@ -73,27 +87,23 @@ class StockMonitor(threading.Thread):
         else:
             return "美股交易中 🟢" if is_open else "美股收盤/未開盤 🔴"
 
-    def fetch_market_index(self):
-        """抓取台股大盤指數 (^TWII)，優先使用 fast_info，失敗則使用 history。"""
-        try:
-            twii = yf.Ticker("^TWII")
-            info = twii.fast_info
-            price = info.get('last_price')
-            
-            if price is None:
-                # 嘗試使用 history
-                hist = twii.history(period="1d")
-                if not hist.empty:
-                    price = hist['Close'].iloc[-1]
-            
-            self.last_market_index = price
-            
-            # 獲取今日漲跌 (如果有的話)
-            prev_close = info.get('previous_close')
-            if price and prev_close:
-                self.last_market_change = price - prev_close
-        except Exception as e:
-            print(f"抓取大盤指數失敗: {e}")
+    @staticmethod
+    def _format_window(seconds):
+        """將閃崩視窗秒數轉成口語描述，例如 60 -> '1 分鐘'。"""
+        if seconds < 60:
+            return f"{seconds} 秒"
+        return f"{seconds // 60} 分鐘"
+
+    @property
+    def last_market_index(self):
+        """台股大盤指數 (^TWII) 的最新快取值。"""
+        snapshot = self.market_index.get("^TWII")
+        return snapshot['price'] if snapshot else None
+
+    @property
+    def last_market_change(self):
+        snapshot = self.market_index.get("^TWII")
+        return snapshot['change'] if snapshot else None
 
     def speak(self, text):
         """朗讀文字，優先使用 pyttsx3，失敗則調用 Mac 原生 say 指令。"""
@@ -112,6 +122,13 @@ class StockMonitor(threading.Thread):
         except Exception as e:
             print(f"原生語音指令執行失敗: {e}")
 
+    def _speak_in_background(self, text):
+        """在背景執行緒朗讀，不阻塞監控迴圈；上一段仍在播報時略過 (日誌已記錄同樣的內容)，避免語音排隊。"""
+        if self._speech_thread and self._speech_thread.is_alive():
+            return
+        self._speech_thread = threading.Thread(target=self.speak, args=(text,), daemon=True)
+        self._speech_thread.start()
+
     def add_log(self, message):
         """將日誌加入緩存，供 Web 端讀取。"""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -184,6 +201,211 @@ class StockMonitor(threading.Thread):
             
         self.add_log("🔕 警報已停止")
 
+    def _sleep_until_open(self, symbol, check_interval=5):
+        """
+        睡到該代號的下一次開盤。每隔 check_interval 秒只檢查本地設定（不發網路請求），
+        使用者切換代號、設定監控清單 (清單中可能有開盤中或 24 小時交易的代號) 或停止監控時立即返回。
+        """
+        next_open = self.data_agent.next_market_open(symbol)
+        deadline = next_open.timestamp() if next_open else time.time() + 60
+        while self.running and time.time() < deadline:
+            config = self.shared_config.get_config()
+            if config['symbol'] != symbol or config.get('watchlist'):
+                return
+            time.sleep(min(check_interval, max(0.0, deadline - time.time())))
+
+    def _on_tick(self, symbol, price, timestamp):
+        """推播成交 (在 WebSocket 執行緒上呼叫)：只記下最新成交並喚醒監控迴圈。"""
+        if symbol == self._push_symbol:
+            self._latest_tick = (price, timestamp)
+            self._tick_event.set()
+
+    def _wait_for_tick(self, symbol):
+        """
+        推播模式：等到下一筆成交才返回，期間多筆成交只取最新一筆 (conflation)。
+        push_timeout 內沒有成交時改走一般輪詢，由 provider 判斷是否以 REST 補救。
+        """
+        if not self._tick_event.wait(self.push_timeout):
+            return self.data_agent.get_market_data(symbol)
+        self._tick_event.clear()
+        price, timestamp = self._latest_tick
+        metadata = self.data_agent.get_metadata(symbol) or {}
+        return {
+            'symbol': symbol,
+            'name': metadata.get('name', symbol),
+            'price': self.data_agent.ingest_tick(symbol, price, timestamp),
+            'stale': False,
+            'provider': self.data_agent._select_provider(symbol).__class__.__name__
+        }
+
+    def _start_alarm(self, symbol, current_price, level, is_stop_loss):
+        """啟動持續警報播報（已在播報中則不重複啟動）。"""
+        if self.alarm_active:
+            return
+        self.alarm_active = True
+        self.alarm_thread = threading.Thread(
+            target=self._continuous_alarm_loop,
+            args=(symbol, current_price, level, is_stop_loss),
+            daemon=True
+        )
+        self.alarm_thread.start()
+
+    def _base_interval(self, symbol):
+        """各市場的輪詢節奏：幣圈 (WebSocket 記憶體) 0.5 秒、台股 5 秒、美股 10 秒。"""
+        if self.simulation_mode:
+            return 1
+        if self.is_crypto(symbol):
+            return 0.5
+        if '.TW' in symbol.upper():
+            return 5
+        return 10
+
+    def _run_watchlist_cycle(self, items):
+        """
+        監控清單模式的一輪：由排程器取出到期的代號，開盤中的以一次批次呼叫取得行情
+        (依 provider 分組並行)，再逐一以各自的狀態判斷閃崩、停損與目標價；
+        休市的代號直接排到下一次開盤。回傳到下一個代號到期的等待秒數。
+        """
+        added, removed = self.watchlist.sync(items)
+        for symbol in removed:
+            self.scheduler.remove(symbol)
+            self.data_agent.unwatch(symbol)
+        for symbol in added:
+            self.scheduler.schedule(symbol)
+        if added:
+            self.add_log(f"監控清單：新增 {', '.join(added)}，共 {len(self.watchlist)} 檔。")
+            if not self.simulation_mode:
+                threading.Thread(target=self._backfill_many, args=(added,), daemon=True).start()
+
+        active = []
+        for symbol in self.scheduler.pop_due():
+            if self.is_crypto(symbol) or self.is_market_open(symbol):
+                active.append(symbol)
+                continue
+            next_open = self.data_agent.next_market_open(symbol)
+            self.scheduler.schedule(symbol, next_open.timestamp() - time.time() if next_open else 60)
+        if active:
+            self._poll_watchlist(active)
+            for symbol in active:
+                # 上游限流時自動拉長該代號的間隔
+                self.scheduler.schedule(symbol, self.data_agent.poll_interval(symbol, self._base_interval(symbol)))
+
+        # 最長睡 1 秒，讓監控清單的設定變更能及時生效
+        wait = self.scheduler.seconds_until_next()
+        return 1.0 if wait is None else min(wait, 1.0)
+
+    def _poll_watchlist(self, symbols):
+        try:
+            market_data = self.data_agent.get_market_data_many(symbols)
+        except Exception as e:
+            self.add_log(f"監控清單行情抓取異常: {e}")
+            return
+
+        fired = False
+        paused = self.test_mode_until > time.time()
+        fresh = {} # {symbol: price}，本輪要判斷警報的新價格
+        for symbol in symbols:
+            entry = self.watchlist.get(symbol)
+            data = market_data.get(symbol) or {}
+            price = data.get('price')
+            if entry is None or price is None:
+                continue
+            entry.name = data.get('name') or symbol
+            entry.stale = bool(data.get('stale'))
+            if entry.stale or paused:
+                # stale 的快取價或測試模式中：只更新顯示與分批價位的起點，不判斷警報
+                entry.price = price
+                self.watchlist.track(symbol, price)
+                continue
+            fresh[symbol] = price
+            fired = self._check_crash_and_levels(entry, price) or fired
+
+        # 目標價 / 停損 / 百分比變動：整批以陣列比較判斷
+        hits = self.watchlist.evaluate(fresh)
+        fired = self._fire_price_alerts(hits, fresh) or fired
+        self.last_update_time = datetime.now().strftime("%H:%M:%S")
+
+        if not fired and not paused and not self.device_off and not self.alarm_active \
+                and self.last_color_state != "yellow" and time.time() >= self._color_hold_until:
+            self.tapo.turn_on_yellow()
+            self.last_color_state = "yellow"
+
+    def _check_crash_and_levels(self, entry, price):
+        """
+        判斷單一代號的閃崩 (需要該代號的歷史窗口) 與分批價位穿越，觸發時回傳 True。
+        閃崩與價格警報一樣套用該代號的冷卻時間，語音在背景播報，不會卡住其他代號的輪詢。
+        """
+        symbol = entry.symbol
+        fired = False
+        crash = self.data_agent.detect_flash_crash(symbol, price)
+        now = time.time()
+        if crash and now - entry.crash_alert_time > entry.cooldown:
+            entry.crash_alert_time = now
+            drop_rate = crash['drop_rate']
+            self.add_log(f"⚠️ {symbol} 偵測到閃崩！{self._format_window(crash['window'])}內實質跌幅 {drop_rate*100:.1f}%")
+            self.device_off = False
+            self.tapo.turn_on_purple()
+            self.last_color_state = "purple"
+            # 閃崩不啟動持續警報，紫燈維持一個冷卻時間，否則下一輪沒有警報就會立刻改回黃燈
+            self._color_hold_until = max(self._color_hold_until, now + entry.cooldown)
+            self._speak_in_background(f"警告，{entry.name} 偵測到恐慌性閃崩，目前跌幅百分之 {drop_rate*100:.1f}。")
+            fired = True
+
+        # 分批停利 / 停損：只處理這筆報價穿越的價位
+        for _, level, kind in self.watchlist.crossed(symbol, price):
+            if kind == 'take_profit':
+                self.add_log(f"🎯 {symbol} 漲破分批停利價 {level} ({price:.2f})")
+                self.tapo.turn_on_green()
+                self.last_color_state = "green"
+            else:
+                self.add_log(f"🆘 {symbol} 跌破分批停損價 {level} ({price:.2f})")
+                self.tapo.turn_on_red()
+                self.last_color_state = "red"
+            self.device_off = False
+            self._start_alarm(symbol, price, level, kind == 'stop_loss')
+            fired = True
+        return fired
+
+    def _fire_price_alerts(self, hits, prices):
+        """處理 Watchlist.evaluate 的結果 (停損、目標價、百分比變動)，有燈號警報時回傳 True。"""
+        fired = False
+        for entry in hits['stop_loss']:
+            price = prices[entry.symbol]
+            self.add_log(f"🆘 觸發停損警報: {entry.symbol} 跌破停損價 {entry.stop_loss} ({price:.2f})")
+            self.device_off = False
+            self.tapo.turn_on_red()
+            self.last_color_state = "red"
+            self._start_alarm(entry.symbol, price, entry.stop_loss, True)
+            fired = True
+        for entry in hits['target']:
+            price = prices[entry.symbol]
+            self.add_log(f"!!! 觸發警報: {entry.symbol} 已達標 ({price:.2f}) !!!")
+            self.device_off = False
+            self.tapo.turn_on_green()
+            self.last_color_state = "green"
+            self._start_alarm(entry.symbol, price, entry.target, False)
+            fired = True
+        for entry in hits['move']:
+            # 百分比變動只記錄，不改變燈號；參考價已移到這次的價格
+            self.add_log(f"📊 {entry.symbol} 相對參考價變動超過 {entry.move_pct:g}% ({prices[entry.symbol]:.2f})")
+        return fired
+
+    def _backfill_many(self, symbols):
+        """背景載入新加入代號的歷史報價，不阻塞監控迴圈。"""
+        for symbol in symbols:
+            try:
+                self.data_agent.backfill(symbol)
+            except Exception as e:
+                print(f"{symbol} 歷史報價載入失敗: {e}")
+
+    def _leave_watchlist_mode(self):
+        """清空監控清單後回到單一代號模式，退訂清單中的推播。"""
+        _, removed = self.watchlist.sync([])
+        for symbol in removed:
+            self.scheduler.remove(symbol)
+            self.data_agent.unwatch(symbol)
+        self.add_log("監控清單已清空，回到單一代號監控。")
+
     def stop_alarm(self):
         """停止警報播報（像鬧鐘的停止按鈕）"""
         if self.alarm_active:
@@ -197,6 +419,7 @@ class StockMonitor(threading.Thread):
 
     def run(self):
         print("StockMonitor 已啟動。")
+        self.market_index.start()
         # 初始狀態：顯示黃色，表示待機/監控中 (使用者要求的常態色)
         try:
             self.tapo.turn_on_yellow()
@@ -206,30 +429,56 @@ class StockMonitor(threading.Thread):
         while self.running:
             try:
                 config = self.shared_config.get_config()
+                # 設定了監控清單時，一個迴圈以批次呼叫驅動所有代號
+                if config.get('watchlist'):
+                    time.sleep(self._run_watchlist_cycle(config['watchlist']))
+                    continue
+                if len(self.watchlist):
+                    self._leave_watchlist_mode()
+
                 symbol = config['symbol']
                 target = config['target_price']
                 stop_loss = config.get('stop_loss_price', 0.0)
                 
                 # 如果代號或目標價變更，重置警報模式與價格緩存
                 if not hasattr(self, '_last_symbol') or self._last_symbol != symbol:
+                    if self._push_symbol:
+                        self.data_agent.unsubscribe_ticks(self._push_symbol, self._on_tick)
+                        self._push_symbol = None
+                    if hasattr(self, '_last_symbol'):
+                        self.data_agent.unwatch(self._last_symbol) # 退訂舊標的的即時推播
                     self.alert_mode = None
                     self.last_stock_name = "監控中..."
                     self.last_stock_price = None  # 同時清除舊價格
                     self._price_history = []      # 清除舊股票的價格歷史，防止誤判閃崩
                     self._last_symbol = symbol
+                    # 載入最近的 1 分 K，讓閃崩偵測一啟動就有基準 (模擬模式不載入真實行情)
+                    if not self.simulation_mode:
+                        seeded = self.data_agent.backfill(symbol)
+                        if seeded:
+                            self.add_log(f"已載入 {symbol} 最近 {seeded} 筆歷史報價，閃崩偵測已就緒。")
+                    if self.push_mode and self.data_agent.subscribe_ticks(symbol, self._on_tick):
+                        self._push_symbol = symbol
+                        self._tick_event.clear()
+                        self.add_log(f"{symbol} 已切換為推播模式，每筆成交即時判斷警報。")
                 
                 if not hasattr(self, '_last_target') or self._last_target != target:
                     self.alert_mode = None
                     self._last_target = target
 
-                # 無論是否休市都更新一次大盤（休市時顯示最後價格）
-                self.fetch_market_index()
-
-                # 如果是台股且休市，則降低檢查頻率
+                # 休市時直接睡到下一次開盤，不再每分鐘輪詢與重複寫日誌
                 if not self.is_crypto(symbol) and not self.is_market_open(symbol):
-                    self.add_log("台股目前休市中，監控暫緩。")
-                    time.sleep(60)
+                    if self._closed_symbol != symbol:
+                        next_open = self.data_agent.next_market_open(symbol)
+                        market = "台股" if ('.TW' in symbol.upper() or '.TWO' in symbol.upper()) else "美股"
+                        if next_open:
+                            self.add_log(f"{market}目前休市中，監控暫緩，將於 {next_open.astimezone():%m/%d %H:%M} 開盤後恢復。")
+                        else:
+                            self.add_log(f"{market}目前休市中，監控暫緩。")
+                        self._closed_symbol = symbol
+                    self._sleep_until_open(symbol)
                     continue
+                self._closed_symbol = None
 
                 # 獲取監控個股數據
                 try:
@@ -243,6 +492,9 @@ class StockMonitor(threading.Thread):
                         self.add_log(f"系統：正在使用模擬數據測試現價 {current_price:.2f}")
                         self.data_agent._clean_data(symbol, current_price)
                         market_data = {'name': symbol, 'price': current_price}
+                    elif self._push_symbol == symbol:
+                        market_data = self._wait_for_tick(symbol)
+                        current_price = market_data['price']
                     else:
                         market_data = self.data_agent.get_market_data(symbol)
                         current_price = market_data['price']
@@ -252,6 +504,18 @@ class StockMonitor(threading.Thread):
                         time.sleep(10)
                         continue
 
+                    # 所有報價來源都失敗時，只顯示最後的快取價格，不以舊價格觸發警報
+                    if market_data.get('stale'):
+                        self.last_stock_price = current_price
+                        if not self._stale_logged:
+                            self.add_log(f"⚠️ {symbol} 報價來源暫時無法連線，顯示最後價格 {current_price:.2f}，暫停警報判斷。")
+                            self._stale_logged = True
+                        time.sleep(self.data_agent.poll_interval(symbol, 10))
+                        continue
+                    if self._stale_logged:
+                        self.add_log(f"✅ {symbol} 報價來源已恢復 ({market_data.get('provider')})")
+                        self._stale_logged = False
+
                     # 如果測試模式啟用中，則暫停自動燈號控制
                     if self.test_mode_until > time.time():
                         # 僅更新數據，不操作 Tapo
@@ -266,9 +530,11 @@ class StockMonitor(threading.Thread):
                     self.current_light_state = "idle" if not self.device_off else "sleep"
 
                     # --- 閃崩偵測 (Purple Light) ---
-                    drop_rate = self.data_agent.detect_flash_crash(symbol, current_price)
-                    if drop_rate:
-                        self.add_log(f"⚠️ 偵測到閃崩！實質跌幅 {drop_rate*100:.1f}%")
+                    crash = self.data_agent.detect_flash_crash(symbol, current_price)
+                    if crash:
+                        drop_rate = crash['drop_rate']
+                        window_text = self._format_window(crash['window'])
+                        self.add_log(f"⚠️ 偵測到閃崩！{window_text}內實質跌幅 {drop_rate*100:.1f}%（每分鐘 {crash['velocity']*100:.2f}%）")
                         self.device_off = False # 強制喚醒
                         self.tapo.turn_on_purple()
                         self.last_color_state = "purple"
@@ -359,7 +625,12 @@ class StockMonitor(threading.Thread):
                         self._log_counter += 1
                         
                         should_log = False
-                        if self._log_counter >= 20:
+                        if self._push_symbol == symbol:
+                            # 推播模式每筆成交跑一輪，改以時間限制日誌頻率
+                            should_log = time.time() - self._last_status_log >= 10
+                            if should_log:
+                                self._last_status_log = time.time()
+                        elif self._log_counter >= 20:
                             should_log = True
                             self._log_counter = 0
                         elif self.last_stock_price != current_price:
@@ -376,6 +647,9 @@ class StockMonitor(threading.Thread):
                         self.tapo.turn_on_red()
                         self.add_log("系統診斷：無法取得數據，切換為紅燈警示。")
                 
+                if self._push_symbol == symbol and self.mock_current_price is None:
+                    continue # 推播模式：下一輪由成交事件喚醒，不固定睡眠
+
                 # 決定下次檢查的時間間隔
                 # Hybrid Architecture Optimization:
                 # Crypto (Websockets) -> 本地記憶體讀取，可以極快 (0.5秒)
@@ -385,7 +659,8 @@ class StockMonitor(threading.Thread):
                 else:
                     sleep_time = 1 if self.simulation_mode else 10
                 
-                time.sleep(sleep_time)
+                # 上游限流時自動拉長間隔，恢復後回到原本節奏
+                time.sleep(self.data_agent.poll_interval(symbol, sleep_time))
 
             except Exception as e:
                 print(f"監控迴圈出錯: {e}")
@@ -393,3 +668,4 @@ class StockMonitor(threading.Thread):
 
     def stop(self):
         self.running = False
+        self.market_index.stop()
@@ -0,0 +1,118 @@
+import threading
+import time
+
+class RateLimitExceeded(Exception):
+    """在等待時間內拿不到 token（或 provider 仍在封鎖期）時拋出。"""
+
+class AdaptiveRateLimiter:
+    """
+    單一 provider 的 token bucket 限流器，所有代號共用同一份額度。
+    - 收到 HTTP 429/418 時依 Retry-After 暫停，並將速率減半
+    - 讀取 Binance X-MBX-USED-WEIGHT-1M 等權重標頭，用量接近上限時預先降速
+    - 正常回應時逐步恢復到原始速率 (AIMD)
+    slowdown / interval() 提供給排程器拉長輪詢間隔。
+    """
+    def __init__(self, name, rate, burst=None, min_rate=None, recovery=1.1,
+                 weight_header=None, weight_limit=None, default_retry_after=30):
+        self.name = name
+        self.base_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.capacity = burst or max(1.0, rate)
+        self.recovery = recovery
+        self.weight_header = weight_header
+        self.weight_limit = weight_limit
+        self.default_retry_after = default_retry_after
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost=1, timeout=None):
+        """取得 token，必要時等待；超過 timeout 仍拿不到則拋出 RateLimitExceeded。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.blocked_until > now:
+                    wait = self.blocked_until - now
+                elif self.tokens >= cost:
+                    self.tokens -= cost
+                    return True
+                else:
+                    wait = (cost - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                raise RateLimitExceeded(f"{self.name} 限流中，{wait:.1f} 秒內無可用額度")
+            time.sleep(wait)
+
+    def on_response(self, status_code, headers=None):
+        """依 HTTP 回應調整速率。"""
+        headers = headers or {}
+        if status_code in (418, 429):
+            self.throttle(self._retry_after(headers))
+            return
+        if self.weight_header and self.weight_limit and headers.get(self.weight_header):
+            try:
+                used = int(headers[self.weight_header])
+            except ValueError:
+                used = 0
+            if used >= self.weight_limit * 0.8:
+                with self._lock:
+                    self.rate = max(self.min_rate, self.rate * 0.5)
+                return
+        self._recover()
+
+    def _retry_after(self, headers):
+        try:
+            return float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return self.default_retry_after
+
+    def throttle(self, retry_after=None):
+        """被上游限流：暫停 retry_after 秒，速率減半。"""
+        retry_after = self.default_retry_after if retry_after is None else retry_after
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            self.tokens = 0.0
+        print(f"⚠️ {self.name} 觸發限流，暫停 {retry_after:.0f} 秒，速率降為 {self.rate:.2f}/s")
+
+    def _recover(self):
+        with self._lock:
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate * self.recovery)
+
+    @property
+    def slowdown(self):
+        """目前速率相對原始速率的倍數 (>= 1)。"""
+        return self.base_rate / self.rate
+
+    def interval(self, base_interval):
+        """依目前限流狀態拉長輪詢間隔；仍在封鎖期時至少等到封鎖結束。"""
+        remaining = self.blocked_until - time.monotonic()
+        return max(base_interval * self.slowdown, remaining)
+
+# 各 provider 的預設額度：(每秒請求數, 突發量, 權重標頭, 權重上限)
+DEFAULT_LIMITS = {
+    'binance': (10.0, 20, "X-MBX-USED-WEIGHT-1M", 6000),
+    'yahoo': (1.0, 5, None, None),
+    'twse': (0.6, 3, None, None), # MIS 約每 5 秒 3 次
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name):
+    """取得某 provider 共用的限流器（延遲建立）。"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            rate, burst, weight_header, weight_limit = DEFAULT_LIMITS.get(name, (1.0, 5, None, None))
+            limiter = _limiters[name] = AdaptiveRateLimiter(name, rate, burst, weight_header=weight_header,
+                                                            weight_limit=weight_limit)
+        return limiter
@@ -0,0 +1,58 @@
+import heapq
+import itertools
+import time
+
+class PollScheduler:
+    """
+    以 min-heap 依「下次到期時間」排序的輪詢排程器。
+    每個代號有自己的節奏 (幣圈次秒級、台股數秒、休市則排到開盤)，
+    pop_due 只取出已到期的代號，成本與到期數量成正比而不是整份清單。
+    重新排程時舊的 heap 項目不刪除，取出時比對序號略過 (lazy deletion)。
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._heap = [] # [(due, seq, symbol)]
+        self._current = {} # {symbol: seq}，只有序號相符的 heap 項目有效
+        self._counter = itertools.count()
+
+    def schedule(self, symbol, delay=0.0):
+        """delay 秒後到期；已排程的代號會以新的時間取代。"""
+        seq = next(self._counter)
+        self._current[symbol] = seq
+        heapq.heappush(self._heap, (self.clock() + delay, seq, symbol))
+
+    def remove(self, symbol):
+        self._current.pop(symbol, None)
+
+    def __contains__(self, symbol):
+        return symbol in self._current
+
+    def __len__(self):
+        return len(self._current)
+
+    def _prune(self):
+        heap = self._heap
+        while heap and self._current.get(heap[0][2]) != heap[0][1]:
+            heapq.heappop(heap)
+
+    def pop_due(self, now=None):
+        """取出所有已到期的代號 (依到期先後)，取出後需由呼叫端重新 schedule。"""
+        now = self.clock() if now is None else now
+        due = []
+        heap = self._heap
+        self._prune()
+        while heap and heap[0][0] <= now:
+            _, seq, symbol = heapq.heappop(heap)
+            if self._current.get(symbol) == seq:
+                del self._current[symbol]
+                due.append(symbol)
+            self._prune()
+        return due
+
+    def seconds_until_next(self, now=None):
+        """距離最早到期的秒數 (已到期為 0)，沒有排程時回傳 None。"""
+        self._prune()
+        if not self._heap:
+            return None
+        now = self.clock() if now is None else now
+        return max(0.0, self._heap[0][0] - now)
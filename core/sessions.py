@@ -0,0 +1,129 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+class ExchangeCalendar:
+    """
+    交易所交易時段日曆：處理時區 (含夏令時間)、國定假日與提前收盤日。
+    is_open / next_open / next_close 會快取「目前時段」與下一個切換點，
+    在切換點之前的查詢都是 O(1)，不必每次重新推算。
+    """
+    MAX_LOOKAHEAD_DAYS = 30
+
+    def __init__(self, name, tz_name, open_time, close_time, holidays=(), early_closes=None):
+        self.name = name
+        self.tz = ZoneInfo(tz_name)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.holidays = frozenset(holidays)
+        self.early_closes = dict(early_closes or {}) # {date: 提前收盤時間}
+        self._cache = None # (valid_from, valid_until, is_open, next_open, next_close)
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self.holidays
+
+    def session(self, day):
+        """回傳某日的 (開盤, 收盤) aware datetime，休市日回傳 None。"""
+        if not self.is_trading_day(day):
+            return None
+        close_time = self.early_closes.get(day, self.close_time)
+        return (datetime.datetime.combine(day, self.open_time, tzinfo=self.tz),
+                datetime.datetime.combine(day, close_time, tzinfo=self.tz))
+
+    def _next_session(self, moment):
+        """回傳收盤時間晚於 moment 的第一個交易時段。"""
+        day = moment.date()
+        for _ in range(self.MAX_LOOKAHEAD_DAYS):
+            bounds = self.session(day)
+            if bounds and bounds[1] > moment:
+                return bounds
+            day += datetime.timedelta(days=1)
+        return None
+
+    def _localize(self, now):
+        if now is None:
+            return datetime.datetime.now(self.tz)
+        # naive datetime 視為系統本地時間
+        return now.astimezone(self.tz)
+
+    def _state(self, now=None):
+        now = self._localize(now)
+        ts = now.timestamp()
+        cache = self._cache
+        if cache and cache[0] <= ts < cache[1]:
+            return cache
+
+        bounds = self._next_session(now)
+        if bounds is None:
+            state = (ts, ts + 3600, False, None, None)
+        elif bounds[0] <= now:
+            following = self._next_session(bounds[1])
+            state = (ts, bounds[1].timestamp(), True, following[0] if following else None, bounds[1])
+        else:
+            state = (ts, bounds[0].timestamp(), False, bounds[0], bounds[1])
+        self._cache = state
+        return state
+
+    def is_open(self, now=None):
+        return self._state(now)[2]
+
+    def next_open(self, now=None):
+        """下一次開盤時間（交易中則為下一個交易日的開盤）。"""
+        return self._state(now)[3]
+
+    def next_close(self, now=None):
+        """下一次收盤時間（交易中則為本時段收盤）。"""
+        return self._state(now)[4]
+
+    def seconds_until_open(self, now=None):
+        """距離開盤的秒數；交易中回傳 0，未知時回傳 None。"""
+        is_open, next_open = self._state(now)[2:4]
+        if is_open:
+            return 0.0
+        if next_open is None:
+            return None
+        return max(0.0, next_open.timestamp() - self._localize(now).timestamp())
+
+def _dates(*values):
+    return [datetime.date.fromisoformat(v) for v in values]
+
+# 假日表需每年依交易所公告更新；未列入的年份只排除週末。
+TWSE_HOLIDAYS = _dates(
+    # 2025
+    "2025-01-01", "2025-01-23", "2025-01-24", "2025-01-27", "2025-01-28", "2025-01-29",
+    "2025-01-30", "2025-01-31", "2025-02-28", "2025-04-03", "2025-04-04", "2025-05-01",
+    "2025-05-30", "2025-09-29", "2025-10-06", "2025-10-10", "2025-10-24", "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-02-12", "2026-02-13", "2026-02-16", "2026-02-17", "2026-02-18",
+    "2026-02-19", "2026-02-20", "2026-02-27", "2026-04-03", "2026-04-06", "2026-05-01",
+    "2026-06-19", "2026-09-25", "2026-09-28", "2026-10-09", "2026-10-26", "2026-12-25",
+)
+
+NYSE_HOLIDAYS = _dates(
+    # 2025
+    "2025-01-01", "2025-01-09", "2025-01-20", "2025-02-17", "2025-04-18", "2025-05-26",
+    "2025-06-19", "2025-07-04", "2025-09-01", "2025-11-27", "2025-12-25",
+    # 2026
+    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25", "2026-06-19",
+    "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+    # 2027
+    "2027-01-01", "2027-01-18", "2027-02-15", "2027-03-26", "2027-05-31", "2027-06-18",
+    "2027-07-05", "2027-09-06", "2027-11-25", "2027-12-24",
+)
+
+NYSE_EARLY_CLOSES = {day: datetime.time(13, 0) for day in _dates(
+    "2025-07-03", "2025-11-28", "2025-12-24",
+    "2026-11-27", "2026-12-24",
+    "2027-11-26",
+)}
+
+TWSE = ExchangeCalendar("TWSE", "Asia/Taipei", datetime.time(9, 0), datetime.time(13, 30),
+                        holidays=TWSE_HOLIDAYS)
+NYSE = ExchangeCalendar("NYSE", "America/New_York", datetime.time(9, 30), datetime.time(16, 0),
+                        holidays=NYSE_HOLIDAYS, early_closes=NYSE_EARLY_CLOSES)
+
+def calendar_for_symbol(symbol):
+    """依代號判斷交易所日曆：台股 (.TW / .TWO / ^TWII) 用 TWSE，其餘股票用 NYSE。"""
+    symbol = symbol.upper()
+    if '.TW' in symbol or symbol == '^TWII':
+        return TWSE
+    return NYSE
@@ -0,0 +1,74 @@
+import threading
+import time
+
+class _Call:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    """
+    請求合併 (single-flight)：同一個 key 同時只會有一個進行中的抓取，
+    其他並行的呼叫者等待並共用同一份結果；結果在 fresh_seconds 內直接重用。
+    None（抓取失敗）不會被快取，下一次呼叫會重新抓取。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # {key: _Call} 進行中的抓取
+        self._results = {} # {key: (monotonic_time, value)}
+
+    def do(self, key, fetch, fresh_seconds=0.0):
+        """以 fetch() 取得 key 的值。"""
+        return self.do_many(key, [None], lambda _: {None: fetch()}, fresh_seconds)[None]
+
+    def do_many(self, namespace, keys, fetch_many, fresh_seconds=0.0):
+        """
+        批次版本：keys 中已有新鮮結果的直接回傳，別人正在抓的等待共用，
+        其餘由本呼叫者以一次 fetch_many(keys) 批量抓取。回傳 {key: value}。
+        """
+        results = {}
+        waiting = {}
+        leading = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                full_key = (namespace, key)
+                cached = self._results.get(full_key)
+                if cached is not None and now - cached[0] < fresh_seconds:
+                    results[key] = cached[1]
+                elif full_key in self._calls:
+                    waiting[key] = self._calls[full_key]
+                else:
+                    leading[key] = self._calls[full_key] = _Call()
+
+        if leading:
+            error = None
+            values = {}
+            try:
+                values = fetch_many(list(leading)) or {}
+            except Exception as e:
+                error = e
+            finished = time.monotonic()
+            with self._lock:
+                for key, call in leading.items():
+                    full_key = (namespace, key)
+                    self._calls.pop(full_key, None)
+                    call.value = values.get(key)
+                    call.error = error
+                    if error is None and call.value is not None:
+                        self._results[full_key] = (finished, call.value)
+            for key, call in leading.items():
+                call.event.set()
+                results[key] = call.value
+            if error is not None:
+                raise error
+
+        for key, call in waiting.items():
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            results[key] = call.value
+        return results
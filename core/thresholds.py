@@ -0,0 +1,106 @@
+from bisect import bisect_left, bisect_right
+
+class _Levels:
+    __slots__ = ("up", "up_rules", "down", "down_rules", "last_price", "disarmed")
+
+    def __init__(self):
+        self.up = []         # 由小到大的向上觸發價
+        self.up_rules = []   # 與 up 平行的規則
+        self.down = []       # 由小到大的向下觸發價
+        self.down_rules = []
+        self.last_price = None
+        self.disarmed = {} # {(direction, level): 重新啟用價}，觸發過、尚未回到區間外的價位
+
+class ThresholdIndex:
+    """
+    每個代號的多檔價位規則索引（例如分批停利、分批停損）。
+    向上與向下的觸發價各自排序，每筆報價以 bisect 找出「上一筆價格到這一筆之間穿越的價位」，
+    成本為 O(log n + 穿越數)，與規則總數無關。
+    穿越定義：向上為 上一筆 < 價位 <= 現價，向下為 現價 <= 價位 < 上一筆；第一筆報價只作為起點，不觸發。
+    價位觸發後即停用，直到價格反向離開價位 rearm_band 比例以上才重新啟用，
+    避免報價在價位附近來回跳動時每次穿越都觸發；停用中的價位只佔 disarmed 的幾筆，不影響查找成本。
+    """
+    def __init__(self, rearm_band=0.005):
+        self.rearm_band = rearm_band
+        self._books = {} # {symbol: _Levels}
+
+    def add(self, symbol, level, direction, rule=None):
+        """新增規則；direction 為 'up' (漲破) 或 'down' (跌破)，rule 為觸發時回傳的物件 (預設為價位本身)。"""
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = _Levels()
+        if direction == 'up':
+            levels, rules = book.up, book.up_rules
+        elif direction == 'down':
+            levels, rules = book.down, book.down_rules
+        else:
+            raise ValueError(f"direction 必須是 'up' 或 'down': {direction}")
+        index = bisect_right(levels, level)
+        levels.insert(index, level)
+        rules.insert(index, level if rule is None else rule)
+
+    def set_levels(self, symbol, up=(), down=()):
+        """以 [(level, rule)] 整批取代某代號的規則，保留上一筆價格與仍存在價位的停用狀態。"""
+        old = self._books.get(symbol) or _Levels()
+        book = self._books[symbol] = _Levels()
+        book.last_price = old.last_price
+        kept = {('up', level) for level, _ in up} | {('down', level) for level, _ in down}
+        book.disarmed = {key: price for key, price in old.disarmed.items() if key in kept}
+        for level, rule in sorted(up, key=lambda item: item[0]):
+            book.up.append(level)
+            book.up_rules.append(rule)
+        for level, rule in sorted(down, key=lambda item: item[0]):
+            book.down.append(level)
+            book.down_rules.append(rule)
+
+    def remove(self, symbol):
+        self._books.pop(symbol, None)
+
+    def levels(self, symbol):
+        """回傳 (向上價位, 向下價位)。"""
+        book = self._books.get(symbol)
+        return (list(book.up), list(book.down)) if book else ([], [])
+
+    def track(self, symbol, price):
+        """只記錄價格、不判斷穿越 (例如暫停警報期間)，恢復後不會把期間的穿越一次補發。"""
+        book = self._books.get(symbol)
+        if book is not None:
+            book.last_price = price
+            self._rearm(book, price)
+
+    @staticmethod
+    def _rearm(book, price):
+        for key, rearm_price in list(book.disarmed.items()):
+            if (price <= rearm_price) if key[0] == 'up' else (price >= rearm_price):
+                del book.disarmed[key]
+
+    def update(self, symbol, price):
+        """
+        以新價格更新，回傳這次穿越的規則 [(direction, level, rule)]：
+        向上依價位由低到高、向下依價位由高到低 (即實際穿越的先後順序)。
+        停用中的價位不回傳；回傳的價位隨即停用。
+        """
+        book = self._books.get(symbol)
+        if book is None:
+            return []
+        previous = book.last_price
+        book.last_price = price
+        self._rearm(book, price)
+        if previous is None or price == previous:
+            return []
+        if price > previous:
+            lo = bisect_right(book.up, previous)
+            hi = bisect_right(book.up, price)
+            crossed = [('up', book.up[i], book.up_rules[i]) for i in range(lo, hi)]
+        else:
+            lo = bisect_left(book.down, price)
+            hi = bisect_left(book.down, previous)
+            crossed = [('down', book.down[i], book.down_rules[i]) for i in range(hi - 1, lo - 1, -1)]
+        fired = []
+        for direction, level, rule in crossed:
+            if (direction, level) in book.disarmed:
+                continue
+            sign = -1 if direction == 'up' else 1
+            book.disarmed[(direction, level)] = level * (1 + sign * self.rearm_band)
+            fired.append((direction, level, rule))
+        return fired
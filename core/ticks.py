@@ -0,0 +1,83 @@
+import json
+import re
+import time
+from collections import deque
+
+# Binance 成交訊息欄位順序固定 (e, E, s, t, p, q, ..., T, m, M)，以一次 regex 取出需要的欄位，
+# 不必為每筆成交建立完整的 dict；格式不符時退回 json.loads
+_TRADE_RE = re.compile(r'"e":"trade".*?"s":"([^"]+)".*?"p":"([^"]+)","q":"([^"]+)".*?"T":(\d+)')
+
+def parse_trade(message):
+    """
+    解析 combined stream 的 trade 訊息，回傳 (symbol, price, qty, trade_time_秒)；
+    非成交訊息 (例如 SUBSCRIBE 的回應) 回傳 None。
+    """
+    match = _TRADE_RE.search(message)
+    if match:
+        symbol, price, qty, trade_time = match.groups()
+        return symbol, float(price), float(qty), int(trade_time) / 1000
+    if '"trade"' not in message:
+        return None
+    data = json.loads(message).get('data') or {}
+    if data.get('e') != 'trade':
+        return None
+    return data['s'], float(data['p']), float(data['q']), data['T'] / 1000
+
+class TickConflator:
+    """
+    成交資料的合併 (conflation) 層：每個代號只保留最新一筆成交與每 interval 秒一根的 OHLCV，
+    讀取端隨時取最新狀態，不必處理每一筆成交。
+    寫入只由 WebSocket 執行緒進行，狀態以 tuple 整筆替換 (CPython 中為原子操作)，不需要鎖；
+    讀取端拿到的永遠是某一筆完整的狀態。
+    另外以 EWMA 追蹤本地接收時間與交易所成交時間的差距 (feed lag)。
+    """
+    def __init__(self, interval=1.0, max_bars=900, lag_alpha=0.05):
+        self.interval = interval
+        self.max_bars = max_bars
+        self.lag_alpha = lag_alpha
+        self.feed_lag = None # 秒，EWMA
+        self._latest = {} # {symbol: (price, exchange_ts, local_ts)}
+        self._bars = {}   # {symbol: (bucket, open, high, low, close, volume)} 目前這根
+        self._closed = {} # {symbol: deque[(bar_start_ts, open, high, low, close, volume)]}
+
+    def on_trade(self, symbol, price, qty, exchange_ts, local_ts=None):
+        local_ts = time.time() if local_ts is None else local_ts
+        self._latest[symbol] = (price, exchange_ts, local_ts)
+
+        bucket = int(exchange_ts // self.interval)
+        bar = self._bars.get(symbol)
+        if bar is None or bucket > bar[0]:
+            if bar is not None:
+                closed = self._closed.get(symbol)
+                if closed is None:
+                    closed = self._closed[symbol] = deque(maxlen=self.max_bars)
+                closed.append((bar[0] * self.interval,) + bar[1:])
+            self._bars[symbol] = (bucket, price, price, price, price, qty)
+        elif bucket == bar[0]:
+            self._bars[symbol] = (bucket, bar[1], max(bar[2], price), min(bar[3], price), price, bar[5] + qty)
+        # 早於目前這根的遲到成交不改寫已收的 K 棒
+
+        lag = local_ts - exchange_ts
+        self.feed_lag = lag if self.feed_lag is None else self.feed_lag + self.lag_alpha * (lag - self.feed_lag)
+
+    def on_quote(self, symbol, price, timestamp=None):
+        """非成交來源 (例如 REST 補救) 的報價：只更新最新價，不計入 K 棒。"""
+        timestamp = time.time() if timestamp is None else timestamp
+        self._latest[symbol] = (price, timestamp, timestamp)
+
+    def latest(self, symbol):
+        """回傳 (price, exchange_ts, local_ts)，沒有資料時回傳 None。"""
+        return self._latest.get(symbol)
+
+    def bars(self, symbol):
+        """已收的 K 棒加上目前這根：[(bar_start_ts, open, high, low, close, volume)]。"""
+        bars = list(self._closed.get(symbol, ()))
+        current = self._bars.get(symbol)
+        if current is not None:
+            bars.append((current[0] * self.interval,) + current[1:])
+        return bars
+
+    def discard(self, symbol):
+        self._latest.pop(symbol, None)
+        self._bars.pop(symbol, None)
+        self._closed.pop(symbol, None)
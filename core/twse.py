@@ -0,0 +1,122 @@
+import json
+import time
+from core.http import UpstreamError, get_http_client
+from core.rate_limit import get_rate_limiter
+
+MIS_URL = "https://mis.twse.com.tw/stock/api/getStockInfo.jsp"
+
+EXCHANGE_NAMES = {'tse': "TWSE", 'otc': "TPEx"}
+
+def _to_float(value):
+    """MIS 欄位為字串，無成交時為 '-'；轉換失敗回傳 None。"""
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price > 0 else None
+
+def _first_level(levels):
+    """取出五檔報價字串 '1015.0000_1010.0000_..._' 的第一檔，不切割整串。"""
+    if not levels:
+        return None
+    return _to_float(levels.partition('_')[0])
+
+class TwseMisClient:
+    """
+    證交所「基本市況報導」(MIS) 即時報價客戶端。
+    上市 (tse_) 與上櫃 (otc_) 代號可合併在同一個 ex_ch 請求中一次取得。
+    .TWO 視為上櫃；.TW 預設為上市，查無資料時會自動改查上櫃並記住對應結果；
+    上櫃也查無資料的代號在 otc_retry_seconds 內不再補查，避免每一輪都多送一次請求。
+    """
+    def __init__(self, base_url=MIS_URL, http_client=None, max_batch=50, otc_retry_seconds=3600):
+        self.base_url = base_url
+        self.http = http_client or get_http_client()
+        self.max_batch = max_batch
+        self.rate_limiter = get_rate_limiter('twse')
+        self._exchange_of = {} # {代號: 'tse' | 'otc'}，記住實際掛牌市場
+        self.otc_retry_seconds = otc_retry_seconds
+        self._otc_misses = {} # {代號: 補查上櫃也查無資料的時間 (monotonic)}
+
+    @staticmethod
+    def split_symbol(symbol):
+        """'2330.TW' -> ('2330', 'tse')；'6488.TWO' -> ('6488', 'otc')"""
+        code, _, suffix = symbol.upper().partition('.')
+        return code, 'otc' if suffix == 'TWO' else 'tse'
+
+    def _channel(self, code, exchange):
+        return f"{exchange}_{code.lower()}.tw"
+
+    def get_quotes(self, symbols):
+        """
+        批次取得報價，回傳 {symbol: {'price', 'prev_close', 'name', 'exchange', 'timestamp'}}。
+        查無報價的代號不會出現在結果中；所有請求都失敗時拋出 UpstreamError。
+        """
+        pending = {}
+        for symbol in dict.fromkeys(symbols):
+            code, exchange = self.split_symbol(symbol)
+            pending[symbol] = (code, self._exchange_of.get(code, exchange))
+
+        answered = set()
+        quotes = self._fetch(pending, answered)
+        if pending and not answered:
+            raise UpstreamError("TWSE MIS 請求全部失敗")
+
+        # .TW 查不到的代號可能其實是上櫃股票，改查另一個市場（一次補查）
+        now = time.monotonic()
+        retry = {s: (code, 'otc') for s, (code, ex) in pending.items()
+                 if s not in quotes and ex == 'tse' and code not in self._exchange_of
+                 and now - self._otc_misses.get(code, float("-inf")) >= self.otc_retry_seconds}
+        if retry:
+            answered = set()
+            quotes.update(self._fetch(retry, answered))
+            for symbol, (code, _) in retry.items():
+                # 只記住請求成功但確實查無資料的代號；網路錯誤下一輪仍會補查
+                if symbol in answered and symbol not in quotes:
+                    self._otc_misses[code] = now
+        return quotes
+
+    def _fetch(self, pending, answered=None):
+        """answered 若提供，會加入請求成功 (HTTP 200) 的代號，不論是否查到資料。"""
+        quotes = {}
+        items = list(pending.items())
+        for i in range(0, len(items), self.max_batch):
+            batch = items[i:i + self.max_batch]
+            lookup = {(ex, code): symbol for symbol, (code, ex) in batch}
+            ex_ch = "|".join(self._channel(code, ex) for _, (code, ex) in batch)
+            try:
+                response = self.http.get(self.base_url, params={"ex_ch": ex_ch, "json": 1, "delay": 0, "_": int(time.time() * 1000)},
+                                         limiter=self.rate_limiter)
+                if response.status_code != 200:
+                    print(f"TWSE MIS HTTP {response.status_code}")
+                    continue
+                self._parse(response.content, lookup, quotes)
+                if answered is not None:
+                    answered.update(lookup.values())
+            except Exception as e:
+                print(f"TWSE MIS Error: {e}")
+        return quotes
+
+    def _parse(self, content, lookup, quotes):
+        """只取需要的欄位：z 成交價、y 昨收、b/a 最佳買賣價、n 名稱、tlong 時間。"""
+        for row in json.loads(content).get("msgArray", ()):
+            key = (row.get("ex"), row.get("c"))
+            symbol = lookup.get(key)
+            if symbol is None:
+                continue
+            price = _to_float(row.get("z"))
+            if price is None:
+                # 當下沒有成交（例如試撮或五秒內無成交）時，以最佳買賣價中間價代替
+                bid, ask = _first_level(row.get("b")), _first_level(row.get("a"))
+                if bid and ask:
+                    price = (bid + ask) / 2
+                else:
+                    price = bid or ask
+            tlong = _to_float(row.get("tlong"))
+            quotes[symbol] = {
+                'price': price,
+                'prev_close': _to_float(row.get("y")),
+                'name': row.get("n"),
+                'exchange': EXCHANGE_NAMES.get(key[0]),
+                'timestamp': tlong / 1000 if tlong else time.time()
+            }
+            self._exchange_of[key[1]] = key[0]
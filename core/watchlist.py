@@ -0,0 +1,132 @@
+import time
+from core.alert_book import VectorizedAlertBook
+from core.thresholds import ThresholdIndex
+
+class WatchEntry:
+    """
+    監控清單中單一代號的設定與顯示狀態。
+    使用 __slots__：上百個代號時每筆只佔固定的幾個欄位，不帶 __dict__。
+    警報方向與冷卻時間存在 Watchlist 的 VectorizedAlertBook 陣列中，以批次判斷。
+    """
+    __slots__ = ("symbol", "target", "stop_loss", "cooldown", "move_pct",
+                 "price", "name", "stale", "updated", "levels", "crash_alert_time")
+
+    def __init__(self, symbol, target, stop_loss=0.0, cooldown=300, move_pct=None):
+        self.symbol = symbol
+        self.target = target
+        self.stop_loss = stop_loss
+        self.cooldown = cooldown
+        self.move_pct = move_pct # 相對參考價變動超過此百分比時提示，None 表示不啟用
+        self.price = None
+        self.name = symbol
+        self.stale = False
+        self.updated = None
+        self.levels = ((), ()) # (分批停利價, 分批停損價)，由 Watchlist 建入 ThresholdIndex
+        self.crash_alert_time = 0.0 # 上次閃崩警報時間，與價格警報一樣受 cooldown 限制
+
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'name': self.name,
+            'price': self.price,
+            'target_price': self.target,
+            'stop_loss_price': self.stop_loss,
+            'cooldown_seconds': self.cooldown,
+            'move_alert_pct': self.move_pct,
+            'take_profit_levels': list(self.levels[0]),
+            'stop_loss_levels': list(self.levels[1]),
+            'stale': self.stale,
+            'updated': self.updated
+        }
+
+class Watchlist:
+    """
+    監控清單：依設定同步 WatchEntry，保留既有代號的警報狀態。
+    目標價 / 停損 / 百分比變動以 VectorizedAlertBook 整批判斷；
+    分批停利 / 停損價位建在 ThresholdIndex 中，每筆報價只檢查穿越的價位。
+    """
+    def __init__(self, default_cooldown=300):
+        self.default_cooldown = default_cooldown
+        self.entries = {} # {symbol: WatchEntry}，維持設定中的順序
+        self.book = VectorizedAlertBook()
+        self.thresholds = ThresholdIndex()
+
+    def sync(self, items):
+        """
+        依設定 [{'symbol', 'target_price', 'stop_loss_price', 'cooldown_seconds', 'move_alert_pct',
+                 'take_profit_levels', 'stop_loss_levels'}] 更新清單，
+        回傳 (新增的代號, 移除的代號)，供呼叫端載入歷史或退訂推播。
+        """
+        entries = {}
+        for item in items:
+            symbol = item['symbol']
+            target = float(item['target_price'])
+            stop_loss = float(item.get('stop_loss_price') or 0.0)
+            cooldown = float(item.get('cooldown_seconds') or self.default_cooldown)
+            move_pct = float(item['move_alert_pct']) if item.get('move_alert_pct') else None
+            entry = self.entries.get(symbol)
+            if entry is None:
+                entry = WatchEntry(symbol, target, stop_loss, cooldown, move_pct)
+            if entry is not self.entries.get(symbol) or \
+                    (entry.target, entry.stop_loss, entry.cooldown, entry.move_pct) != (target, stop_loss, cooldown, move_pct):
+                entry.target, entry.stop_loss, entry.cooldown, entry.move_pct = target, stop_loss, cooldown, move_pct
+                self.book.set_rule(symbol, target, stop_loss, cooldown, move_pct)
+            levels = (tuple(item.get('take_profit_levels') or ()), tuple(item.get('stop_loss_levels') or ()))
+            if levels != entry.levels or symbol not in self.entries:
+                entry.levels = levels
+                self.thresholds.set_levels(symbol, up=[(level, 'take_profit') for level in levels[0]],
+                                           down=[(level, 'stop_loss') for level in levels[1]])
+            entries[symbol] = entry
+        added = [s for s in entries if s not in self.entries]
+        removed = [s for s in self.entries if s not in entries]
+        for symbol in removed:
+            self.book.remove(symbol)
+            self.thresholds.remove(symbol)
+        self.entries = entries
+        return added, removed
+
+    def evaluate(self, prices, now=None):
+        """
+        以一批新價格 {symbol: price} 判斷目標價 / 停損 / 百分比變動，
+        回傳 {'stop_loss': [WatchEntry], 'target': [...], 'move': [...]}，只含觸發的代號。
+        """
+        now = time.time() if now is None else now
+        if not prices:
+            return {'stop_loss': [], 'target': [], 'move': []}
+        for symbol, price in prices.items():
+            entry = self.entries[symbol]
+            entry.price = price
+            entry.updated = now
+        indices = self.book.update(list(prices), list(prices.values()))
+        fired = self.book.evaluate(indices, now)
+        symbols = self.book.symbols
+        return {kind: [self.entries[symbols[i]] for i in hits] for kind, hits in fired.items()}
+
+    def crossed(self, symbol, price):
+        """這筆報價穿越且仍啟用的分批價位 [(direction, level, 'take_profit' | 'stop_loss')]。"""
+        return self.thresholds.update(symbol, price)
+
+    def track(self, symbol, price):
+        """只更新分批價位的上一筆價格，不觸發 (stale 報價或暫停警報期間)。"""
+        self.thresholds.track(symbol, price)
+
+    def symbols(self):
+        return list(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(list(self.entries.values()))
+
+    def get(self, symbol):
+        return self.entries.get(symbol)
+
+    def snapshot(self):
+        snapshot = []
+        for entry in self:
+            values = entry.to_dict()
+            if entry.symbol in self.book.index:
+                values.update(self.book.state(entry.symbol))
+            snapshot.append(values)
+        return snapshot
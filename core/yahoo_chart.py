@@ -0,0 +1,133 @@
+import json
+import time
+from core.http import UpstreamError, get_http_client
+from core.rate_limit import get_rate_limiter
+
+CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
+SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+
+def _to_float(value):
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price > 0 else None
+
+class YahooChartClient:
+    """
+    直接呼叫 Yahoo chart JSON 端點的輕量報價客戶端：只解析需要的欄位成 float，
+    不建立 pandas DataFrame，也不需要在啟動時載入 yfinance / pandas。
+    chart 端點一次只查一檔；get_quotes 改用 spark 端點，一個請求最多 batch_size 檔，
+    回應中每檔的格式與 chart 相同，代號增加時請求數不會跟著一對一增加。
+    """
+    def __init__(self, base_url=CHART_URL, spark_url=SPARK_URL, http_client=None, batch_size=20):
+        self.base_url = base_url
+        self.spark_url = spark_url
+        self.http = http_client or get_http_client()
+        self.rate_limiter = get_rate_limiter('yahoo')
+        self.batch_size = batch_size # spark 端點單次最多 20 檔
+
+    def get_chart(self, symbol, range_="1d", interval="1m"):
+        """取得 chart 結果中的 (meta, [(timestamp, close), ...])；失敗回傳 (None, [])。"""
+        try:
+            response = self.http.get(self.base_url.format(symbol=symbol),
+                                     params={"range": range_, "interval": interval, "includePrePost": "false"},
+                                     limiter=self.rate_limiter)
+            if response.status_code != 200:
+                print(f"Yahoo chart HTTP {response.status_code}: {symbol}")
+                return None, []
+            return self._parse(response.content)
+        except Exception as e:
+            print(f"Yahoo chart Error ({symbol}): {e}")
+            return None, []
+
+    @staticmethod
+    def _parse(content):
+        result = (json.loads(content).get("chart") or {}).get("result")
+        if not result:
+            return None, []
+        return YahooChartClient._parse_result(result[0])
+
+    @staticmethod
+    def _parse_result(result):
+        meta = result.get("meta") or {}
+        timestamps = result.get("timestamp") or ()
+        quote = ((result.get("indicators") or {}).get("quote") or [{}])[0]
+        closes = quote.get("close") or ()
+        # 尚未成交的 K 棒收盤價為 null，直接略過
+        points = [(float(ts), float(close)) for ts, close in zip(timestamps, closes) if close]
+        return meta, points
+
+    @staticmethod
+    def _quote(meta, points):
+        """由 chart meta 組成報價 dict；價格以 regularMarketPrice 為主，缺少時用最後一根 K 棒的收盤價。"""
+        price = _to_float(meta.get("regularMarketPrice"))
+        timestamp = meta.get("regularMarketTime")
+        if price is None and points:
+            timestamp, price = points[-1]
+        if price is None:
+            return None
+        return {
+            'price': price,
+            'prev_close': _to_float(meta.get("chartPreviousClose")) or _to_float(meta.get("previousClose")),
+            'name': meta.get("longName") or meta.get("shortName"),
+            'currency': meta.get("currency"),
+            'exchange': meta.get("fullExchangeName") or meta.get("exchangeName"),
+            'timestamp': float(timestamp) if timestamp else time.time()
+        }
+
+    def get_quote(self, symbol):
+        """回傳 {'price', 'prev_close', 'name', 'currency', 'exchange', 'timestamp'}；查無報價回傳 None。"""
+        meta, points = self.get_chart(symbol, range_="1d", interval="1m")
+        if meta is None:
+            return None
+        return self._quote(meta, points)
+
+    def get_quotes(self, symbols, answered=None):
+        """
+        以 spark 端點批次查詢，回傳 {symbol: quote}；查無報價的代號不會出現在結果中。
+        answered 若提供，會加入請求成功的代號 (不論是否有報價)，供呼叫端區分「查無資料」與「請求失敗」。
+        所有批次都失敗 (HTTP 錯誤、連線錯誤或本地限流拒絕) 時拋出最後一個錯誤。
+        """
+        symbols = list(dict.fromkeys(symbols))
+        quotes = {}
+        error = None
+        succeeded = False
+        for i in range(0, len(symbols), self.batch_size):
+            batch = symbols[i:i + self.batch_size]
+            try:
+                response = self.http.get(self.spark_url, params={"symbols": ",".join(batch), "range": "1d", "interval": "1m"},
+                                         limiter=self.rate_limiter)
+                # 整批代號都不存在時 spark 回 404，視為查無資料而非上游錯誤
+                if response.status_code not in (200, 404):
+                    raise UpstreamError(f"Yahoo spark HTTP {response.status_code}")
+                if response.status_code == 200:
+                    self._parse_spark(response.content, batch, quotes)
+            except Exception as e:
+                print(f"Yahoo spark Error ({','.join(batch)}): {e}")
+                error = e
+                continue
+            succeeded = True
+            if answered is not None:
+                answered.update(batch)
+        if error is not None and not succeeded:
+            raise error
+        return quotes
+
+    def _parse_spark(self, content, batch, quotes):
+        lookup = {symbol.upper(): symbol for symbol in batch}
+        for item in (json.loads(content).get("spark") or {}).get("result") or ():
+            symbol = lookup.get((item.get("symbol") or "").upper())
+            response = item.get("response")
+            if symbol is None or not response:
+                continue
+            quote = self._quote(*self._parse_result(response[0]))
+            if quote:
+                quotes[symbol] = quote
+
+    def get_history(self, symbol, minutes):
+        """最近 minutes 根 1 分 K 的 [(收盤時間, 收盤價)]，收盤時間不超過現在。"""
+        _, points = self.get_chart(symbol, range_="1d", interval="1m")
+        now = time.time()
+        # K 棒時間為開盤時間，收盤價對應到該分鐘結束
+        return [(min(ts + 60, now), price) for ts, price in points[-minutes:]] if minutes > 0 else []
@@ -0,0 +1,54 @@
+"""
+比較 YahooChartClient (chart JSON) 與 yfinance (ticker.history -> DataFrame) 的取價耗時。
+需要網路連線；從專案根目錄執行：
+    python scripts/bench_yahoo_chart.py --symbols 2330.TW AAPL ^TWII --rounds 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def report(label, samples):
+    print(f"{label:<28} median {statistics.median(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Yahoo chart client vs yfinance benchmark")
+    parser.add_argument("--symbols", nargs="+", default=["2330.TW", "AAPL", "^TWII"])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # 匯入成本：yfinance 會連帶載入 pandas / numpy
+    start = time.perf_counter()
+    from core.yahoo_chart import YahooChartClient
+    chart_import = time.perf_counter() - start
+    start = time.perf_counter()
+    import yfinance as yf
+    yf_import = time.perf_counter() - start
+    print(f"import core.yahoo_chart: {chart_import * 1000:.1f} ms / import yfinance: {yf_import * 1000:.1f} ms\n")
+
+    client = YahooChartClient()
+    client.rate_limiter.rate = client.rate_limiter.base_rate = 100.0 # 量測時不受限流影響
+    for symbol in args.symbols:
+        print(symbol)
+        report("  YahooChartClient.get_quote", timed(lambda: client.get_quote(symbol), args.rounds))
+        report("  yf history Close[-1]",
+               timed(lambda: yf.Ticker(symbol).history(period="1d", interval="1m")['Close'].iloc[-1], args.rounds))
+
+    report(f"get_quotes ({len(args.symbols)} 檔 spark)", timed(lambda: client.get_quotes(args.symbols), args.rounds))
+    report(f"yf.download ({len(args.symbols)} 檔)",
+           timed(lambda: yf.download(" ".join(args.symbols), period="1d", interval="1m", group_by="ticker",
+                                     progress=False, threads=True), args.rounds))
+
+if __name__ == "__main__":
+    main()
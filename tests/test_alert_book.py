@@ -0,0 +1,47 @@
+from core.alert_book import VectorizedAlertBook
+
+def _fired(book, prices, now):
+    indices = book.update(list(prices), list(prices.values()))
+    hits = book.evaluate(indices, now)
+    return {kind: [book.symbols[i] for i in hit] for kind, hit in hits.items() if len(hit)}
+
+def test_direction_cooldown_and_stop_priority():
+    book = VectorizedAlertBook()
+    book.set_rule("AAPL", 200.0, cooldown=60)
+    book.set_rule("MSFT", 400.0, stop_loss=350.0, cooldown=60)
+    assert _fired(book, {"AAPL": 190.0, "MSFT": 420.0}, now=0) == {}
+    assert book.state("AAPL")['alert_mode'] == 'above'
+    assert book.state("MSFT")['alert_mode'] == 'below'
+
+    assert _fired(book, {"AAPL": 201.0, "MSFT": 340.0}, now=10) == {'target': ["AAPL"], 'stop_loss': ["MSFT"]}
+    assert _fired(book, {"AAPL": 202.0, "MSFT": 330.0}, now=30) == {} # 冷卻中
+    assert _fired(book, {"AAPL": 203.0}, now=100) == {'target': ["AAPL"]}
+
+def test_move_alert_resets_reference():
+    book = VectorizedAlertBook()
+    book.set_rule("BTC-USD", 1e6, move_pct=5)
+    assert _fired(book, {"BTC-USD": 100.0}, now=0) == {}
+    assert _fired(book, {"BTC-USD": 104.0}, now=1) == {}
+    assert _fired(book, {"BTC-USD": 106.0}, now=2) == {'move': ["BTC-USD"]}
+    assert book.state("BTC-USD")['reference_price'] == 106.0
+    assert _fired(book, {"BTC-USD": 108.0}, now=3) == {}
+
+def test_only_updated_indices_are_evaluated():
+    book = VectorizedAlertBook()
+    book.set_rule("AAPL", 200.0, cooldown=0)
+    book.set_rule("MSFT", 400.0, cooldown=0)
+    _fired(book, {"AAPL": 190.0, "MSFT": 390.0}, now=0)
+    _fired(book, {"AAPL": 210.0}, now=1)
+    # MSFT 本輪沒有新價格，舊價格不應再被判斷
+    assert _fired(book, {"MSFT": 395.0}, now=2) == {}
+
+def test_remove_and_grow_keep_rows_consistent():
+    book = VectorizedAlertBook(capacity=2)
+    for i in range(5):
+        book.set_rule(f"S{i}", 100.0 + i)
+    assert len(book) == 5 and len(book.price) >= 5
+    book.remove("S1")
+    assert "S1" not in book.index and book.symbols[book.index["S4"]] == "S4"
+    assert book.target[book.index["S4"]] == 104.0
+    assert _fired(book, {"S4": 90.0}, now=0) == {}
+    assert book.state("S4")['alert_mode'] == 'above'
@@ -0,0 +1,42 @@
+import time
+from core.circuit import CircuitBreaker
+
+def test_opens_on_error_rate_and_recovers_after_probe():
+    breaker = CircuitBreaker("test", min_calls=4, open_seconds=0.1)
+    for _ in range(2):
+        breaker.record_success(0.1)
+    for _ in range(2):
+        breaker.record_failure(0.1)
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.allow()      # 半開：放行一次探測
+    assert not breaker.allow()  # 探測進行中不再放行
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_opens_on_p95_latency():
+    breaker = CircuitBreaker("slow", min_calls=5, latency_threshold=2.0)
+    for latency in (0.2, 0.3, 0.2, 0.4, 5.0):
+        breaker.record_success(latency)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.p95_latency == 5.0
+
+def test_health_key_only_demotes_open_breakers():
+    fast = CircuitBreaker("a", min_calls=2)
+    fast.record_success(0.1)
+    fast.record_success(0.1)
+    unknown = CircuitBreaker("b", min_calls=2)
+    slow = CircuitBreaker("c", min_calls=2)
+    slow.record_success(1.2)
+    slow.record_success(1.2)
+    assert fast.health_key() == unknown.health_key() == slow.health_key() # 延遲不影響排序
+
+    broken = CircuitBreaker("d", min_calls=2, open_seconds=0.1)
+    broken.record_failure(0.1)
+    broken.record_failure(0.1)
+    assert broken.health_key() > fast.health_key()
+    time.sleep(0.15)
+    assert broken.health_key() == fast.health_key() # 冷卻結束：回到原位置接受探測
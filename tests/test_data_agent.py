@@ -0,0 +1,409 @@
+import time
+from core.data_agent import MarketDataAgent, YFinanceProvider
+
+class _FakeChart:
+    """只回傳固定報價的 YahooChartClient 替身。"""
+    rate_limiter = None
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.batches = []
+
+    def get_quotes(self, symbols, answered=None):
+        self.batches.append(list(symbols))
+        if answered is not None:
+            answered.update(symbols)
+        return {s: {'price': self.prices[s]} for s in symbols if s in self.prices}
+
+def test_get_prices_uses_chart_batch():
+    chart = _FakeChart({"2330.TW": 1005.0, "AAPL": 190.0})
+    provider = YFinanceProvider(chart_client=chart)
+    prices = provider.get_prices(["2330.TW", "AAPL"])
+
+    assert chart.batches == [["2330.TW", "AAPL"]]
+    assert prices == {"2330.TW": 1005.0, "AAPL": 190.0}
+
+def test_get_prices_falls_back_per_symbol(monkeypatch):
+    provider = YFinanceProvider(chart_client=_FakeChart({"2330.TW": 1001.0}))
+    monkeypatch.setattr(provider, "_yfinance_price", lambda symbol: 42.0)
+
+    prices = provider.get_prices(["2330.TW", "2317.TW"])
+    assert prices == {"2330.TW": 1001.0, "2317.TW": 42.0}
+
+def test_agent_get_prices_groups_by_provider(monkeypatch):
+    agent = MarketDataAgent()
+    batches = []
+
+    def fake_get_prices(symbols):
+        batches.append(tuple(symbols))
+        return {s: 100.0 for s in symbols}
+
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", fake_get_prices)
+    monkeypatch.setattr(agent.providers['tw'], "get_prices", fake_get_prices)
+
+    prices = agent.get_prices(["AAPL", "2330.TW", "MSFT", "2317.TW"])
+    assert sorted(batches) == [("2330.TW", "2317.TW"), ("AAPL", "MSFT")]
+    assert all(p == 100.0 for p in prices.values())
+
+class _FakeWs:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        import json
+        self.sent.append(json.loads(message))
+
+def test_binance_subscriptions_share_one_connection(monkeypatch):
+    from core.data_agent import BinanceProvider
+
+    provider = BinanceProvider()
+    monkeypatch.setattr(provider, "_ensure_connection", lambda: None)
+    provider.ws_app = _FakeWs()
+    provider.connected = True
+
+    assert provider.subscribe(["BTC-USD", "ETH-USD"]) == ["BTCUSDT", "ETHUSDT"]
+    assert provider.subscribe(["BTC-USD"]) == [] # 已訂閱不重送
+    provider.unsubscribe(["ETH-USD"])
+
+    assert [m['method'] for m in provider.ws_app.sent] == ["SUBSCRIBE", "UNSUBSCRIBE"]
+    assert provider.ws_app.sent[0]['params'] == ["btcusdt@trade", "ethusdt@trade"]
+    assert provider.ws_app.sent[1]['params'] == ["ethusdt@trade"]
+    assert list(provider._aliases) == ["BTCUSDT"]
+
+def test_flash_crash_on_ring_buffer():
+    agent = MarketDataAgent()
+    agent.simulation_mode = True
+    for p in [100.1, 99.9, 100.2, 99.8, 100.0, 100.1, 90.0]:
+        agent._clean_data("TEST", p)
+
+    crash = agent.detect_flash_crash("TEST", 90.0)
+    assert crash is not None and crash['drop_rate'] > 0.09
+    assert crash['window'] == 10
+
+def test_backfill_arms_detection_before_live_ticks(monkeypatch):
+    agent = MarketDataAgent()
+    now = time.time()
+    candles = [(now - 60 * (15 - i), 100.0 + (i % 2) * 0.2) for i in range(15)]
+    monkeypatch.setattr(agent.providers['yf'], "get_history", lambda symbol, minutes: candles)
+
+    assert agent.backfill("AAPL") == 15
+    assert agent.backfill("AAPL") == 0 # 已有足夠新的歷史，不重複載入
+
+    agent._clean_data("AAPL", 94.0)
+    crash = agent.detect_flash_crash("AAPL", 94.0)
+    assert crash is not None and crash['window'] == 300
+
+def test_get_market_data_many_runs_providers_concurrently(monkeypatch):
+    agent = MarketDataAgent()
+    agent.provider_timeouts['binance'] = 0.5
+
+    def slow_prices(symbols, delay):
+        time.sleep(delay)
+        return {s: 100.0 for s in symbols}
+
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", lambda symbols: slow_prices(symbols, 0.3))
+    monkeypatch.setattr(agent.providers['tw'], "get_prices", lambda symbols: slow_prices(symbols, 0.3))
+    monkeypatch.setattr(agent.providers['binance'], "get_prices", lambda symbols: slow_prices(symbols, 2.0))
+    monkeypatch.setattr(agent, "get_metadata_many", lambda symbols: {s: {'name': s} for s in symbols})
+    agent.failover_chains['binance'] = ('binance',)
+
+    started = time.time()
+    data = agent.get_market_data_many(["AAPL", "2330.TW", "BTC-USD"])
+    elapsed = time.time() - started
+
+    assert elapsed < 1.0 # 取決於最慢的呼叫 (逾時 0.5 秒)，而非 0.3 + 0.3 + 2.0
+    assert data["AAPL"]['price'] == 100.0
+    assert data["2330.TW"]['price'] == 100.0
+    assert data["BTC-USD"]['price'] is None # 逾時
+
+def test_failover_chain_and_stale_fallback(monkeypatch):
+    agent = MarketDataAgent()
+    monkeypatch.setattr(agent, "get_metadata_many", lambda symbols: {s: {'name': s} for s in symbols})
+    monkeypatch.setattr(agent.providers['tw'], "get_prices", lambda symbols: {s: None for s in symbols})
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", lambda symbols: {s: 1000.0 for s in symbols})
+
+    data = agent.get_market_data("2330.TW")
+    assert data['price'] == 1000.0
+    assert data['provider'] == "YFinanceProvider"
+    assert data['stale'] is False
+
+    def broken(symbols):
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", broken)
+    agent.quote_freshness['YFinanceProvider'] = 0
+    data = agent.get_market_data("2330.TW")
+    assert data['price'] == 1000.0 # 最後的快取價
+    assert data['stale'] is True
+
+def test_circuit_breaker_skips_failing_provider(monkeypatch):
+    agent = MarketDataAgent()
+    calls = []
+
+    def failing(symbols):
+        calls.append(symbols)
+        raise ConnectionError("MIS down")
+
+    monkeypatch.setattr(agent.providers['tw'], "get_prices", failing)
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", lambda symbols: {s: 500.0 for s in symbols})
+    agent.quote_freshness['TaiwanStockProvider'] = 0
+
+    for _ in range(8):
+        agent._fetch_quotes('tw', ["2317.TW"])
+
+    assert agent.breakers['tw'].state == "open"
+    assert len(calls) == agent.breakers['tw'].min_calls
+    assert agent._ranked_chain('tw')[0] == 'yf'
+
+def test_unknown_symbol_does_not_open_breaker(monkeypatch):
+    agent = MarketDataAgent()
+    monkeypatch.setattr(agent.providers['tw'], "get_prices",
+                        lambda symbols: {s: None if s == "9999.TW" else 1000.0 for s in symbols})
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", lambda symbols: {s: None for s in symbols})
+    agent.quote_freshness['TaiwanStockProvider'] = agent.quote_freshness['YFinanceProvider'] = 0
+
+    for _ in range(8):
+        quotes = agent._fetch_quotes('tw', ["9999.TW"])
+    assert quotes["9999.TW"][2] is True # 查無報價：stale
+    assert agent.breakers['tw'].state == "closed"
+    assert agent.breakers['yf'].state == "closed"
+    assert agent._fetch_quotes('tw', ["2330.TW"])["2330.TW"] == (1000.0, 'tw', False)
+
+def test_unmeasured_primary_is_not_locked_out(monkeypatch):
+    agent = MarketDataAgent()
+    calls = []
+    monkeypatch.setattr(agent, "get_metadata_many", lambda symbols: {s: {'name': s} for s in symbols})
+    monkeypatch.setattr(agent.providers['yf'], "get_prices",
+                        lambda symbols: calls.append('yf') or {s: 200.0 for s in symbols})
+    monkeypatch.setattr(agent.providers['tw'], "get_prices",
+                        lambda symbols: calls.append('tw') or {s: 1000.0 for s in symbols})
+    agent.quote_freshness['YFinanceProvider'] = agent.quote_freshness['TaiwanStockProvider'] = 0
+
+    for _ in range(5):
+        agent.get_market_data("AAPL") # yf 先累積樣本
+    calls.clear()
+    for _ in range(3):
+        assert agent.get_market_data("2330.TW")['provider'] == "TaiwanStockProvider"
+    assert calls == ['tw'] * 3
+
+def test_hedged_request_uses_faster_provider(monkeypatch):
+    agent = MarketDataAgent()
+    agent.hedging = True
+    monkeypatch.setattr(agent, "get_metadata_many", lambda symbols: {s: {'name': s} for s in symbols})
+    agent.quote_freshness['TaiwanStockProvider'] = 0
+    agent.quote_freshness['YFinanceProvider'] = 0
+    # 讓 tw 的 p90 延遲約 0.05 秒
+    for _ in range(agent.breakers['tw'].min_calls):
+        agent.breakers['tw'].record_success(0.05)
+
+    def slow_tw(symbols):
+        time.sleep(1.0)
+        return {s: 990.0 for s in symbols}
+
+    monkeypatch.setattr(agent.providers['tw'], "get_prices", slow_tw)
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", lambda symbols: {s: 1000.0 for s in symbols})
+
+    start = time.monotonic()
+    quotes = agent._fetch_quotes('tw', ["2330.TW"])
+    assert time.monotonic() - start < 0.5
+    assert quotes["2330.TW"] == (1000.0, 'yf', False)
+    assert agent.hedge_budgets['tw'].hedges == 1
+
+def test_hedge_keeps_its_own_timeout(monkeypatch):
+    agent = MarketDataAgent()
+    agent.hedging = True
+    agent.provider_timeouts.update({'tw': 0.3, 'yf': 0.6})
+    agent.quote_freshness['TaiwanStockProvider'] = agent.quote_freshness['YFinanceProvider'] = 0
+    for _ in range(agent.breakers['tw'].min_calls):
+        agent.breakers['tw'].record_success(0.05)
+
+    def slow(price, delay):
+        def get_prices(symbols):
+            time.sleep(delay)
+            return {s: price for s in symbols}
+        return get_prices
+
+    monkeypatch.setattr(agent.providers['tw'], "get_prices", slow(990.0, 0.5))
+    monkeypatch.setattr(agent.providers['yf'], "get_prices", slow(1000.0, 0.35))
+    # 對衝的 yf 在 tw 逾時 (0.3 秒) 之後才回應，仍在自己的逾時內
+    assert agent._fetch_quotes('tw', ["2330.TW"])["2330.TW"] == (1000.0, 'yf', False)
+
+def test_hedge_budget_bounds_extra_requests():
+    from core.hedge import HedgeBudget
+    budget = HedgeBudget(ratio=0.25, burst=2.0)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(4):
+        budget.record_request()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+class _KlinesHttp:
+    """依 endTime 與 limit 回傳最近 K 線的 HttpClient 替身，closes 為 {開盤秒: 收盤價}。"""
+    def __init__(self, closes):
+        self.closes = closes
+        self.params = []
+
+    def get(self, url, params=None, **kwargs):
+        self.params.append(params)
+        klines = [[t * 1000, "0", "0", "0", str(p), "1", t * 1000 + 999]
+                  for t, p in sorted(self.closes.items()) if t * 1000 <= params['endTime']][-params['limit']:]
+        return type("Response", (), {"status_code": 200, "json": lambda self: klines})()
+
+def test_binance_reconnect_fills_gap_into_history():
+    from core.data_agent import BinanceProvider
+
+    agent = MarketDataAgent()
+    provider = BinanceProvider(http_client=_KlinesHttp({999: 101.0, 1000: 100.5, 1001: 99.0, 1002: 98.0}))
+    provider.gap_listener = agent.ingest_history
+    provider._aliases["BTCUSDT"] = "BTC-USD"
+
+    provider._fill_gaps([("BTCUSDT", 1000.0)], 1002.5) # 1002 秒的 K 線在重連時尚未收盤
+
+    history = agent.price_history["BTC-USD"]
+    assert list(history.prices()) == [100.5, 99.0]
+    assert list(history.timestamps()) == [1000.999, 1001.999]
+
+def test_gap_fill_pages_backwards_from_reconnect():
+    from core.data_agent import BinanceProvider
+
+    http = _KlinesHttp({t: float(t) for t in range(1000, 1010)})
+    provider = BinanceProvider(http_client=http)
+    provider.GAP_FILL_PAGE_SIZE = 3
+    provider.GAP_FILL_MAX_PAGES = 2
+
+    points = provider._fetch_klines("BTCUSDT", 999.0, 1010.0)
+    # 頁數不夠時缺的是最舊的一段，最接近重連的部分完整
+    assert [price for _, price in points] == [float(t) for t in range(1004, 1010)]
+    assert [params['endTime'] for params in http.params] == [1_010_000, 1_006_999]
+
+def test_gap_fill_lands_before_live_ticks_received_during_fill():
+    agent = MarketDataAgent()
+    agent._clean_data("BTC-USD", 100.0, 1000.0)
+    agent.hold_ticks("BTC-USD")
+    # 重連後的新成交比 REST 補齊先到：先暫存，不寫入
+    assert agent.ingest_tick("BTC-USD", 101.0, 1010.1) == 101.0
+    assert list(agent.price_history["BTC-USD"].timestamps()) == [1000.0]
+
+    count = agent.ingest_history("BTC-USD", [(float(t), 100.0 + (t - 1000) * 0.1) for t in range(1001, 1010)])
+    assert count == 9
+    history = agent.price_history["BTC-USD"]
+    assert list(history.timestamps()) == [1000.0] + [float(t) for t in range(1001, 1010)] + [1010.1]
+    assert history.price_at(-1) == 101.0
+
+    agent._clean_data("BTC-USD", 101.5, 1011.0) # 解除暫存後照常寫入
+    assert history.timestamp_at(-1) == 1011.0
+
+def test_failed_gap_fill_releases_held_ticks():
+    from core.data_agent import BinanceProvider
+
+    class _DownHttp:
+        def get(self, url, params=None, **kwargs):
+            raise ConnectionError("down")
+
+    agent = MarketDataAgent()
+    provider = BinanceProvider(http_client=_DownHttp())
+    provider.gap_begin_listener = agent.hold_ticks
+    provider.gap_listener = agent.ingest_history
+    agent._clean_data("BTC-USD", 100.0, 1000.0)
+    provider.gap_begin_listener("BTC-USD")
+    agent.ingest_tick("BTC-USD", 100.2, 1005.0)
+
+    provider._fill_gaps([("BTCUSDT", 1000.0)], 1004.0, {"BTCUSDT": "BTC-USD"})
+    assert list(agent.price_history["BTC-USD"].timestamps()) == [1000.0, 1005.0]
+
+def test_binance_reconnect_backoff_is_bounded():
+    from core.data_agent import BinanceProvider
+
+    provider = BinanceProvider()
+    delays = [provider._reconnect_delay(attempt) for attempt in range(12)]
+    assert all(0 <= d <= provider.RECONNECT_MAX for d in delays)
+    assert max(provider._reconnect_delay(1) for _ in range(50)) <= 2 * provider.RECONNECT_BASE
+
+def test_binance_supervisor_reconnects_after_drop(monkeypatch):
+    from core.data_agent import BinanceProvider
+
+    provider = BinanceProvider()
+    runs = []
+
+    def dropped_connection():
+        runs.append(time.monotonic())
+        if len(runs) == 3:
+            provider.running = False
+
+    monkeypatch.setattr(provider, "_run_ws", dropped_connection)
+    monkeypatch.setattr(provider, "_reconnect_delay", lambda attempt: 0)
+    provider.running = True
+    provider._supervise()
+    assert len(runs) == 3
+
+def test_clean_data_uses_exchange_time_and_stays_monotonic():
+    agent = MarketDataAgent()
+    agent.simulation_mode = True
+    agent._clean_data("BTC-USD", 100.0, ts=1000.0)
+    agent._clean_data("BTC-USD", 100.0, ts=1000.0) # 同一筆 tick 重複輪詢
+    agent._clean_data("BTC-USD", 99.0, ts=999.5)   # 時間倒退：夾到最後一筆
+    agent._clean_data("BTC-USD", 98.0, ts=1001.0)
+
+    history = agent.price_history["BTC-USD"]
+    assert list(history.timestamps()) == [1000.0, 1000.0, 1001.0]
+    assert list(history.prices()) == [100.0, 99.0, 98.0]
+
+def test_binance_ticks_feed_exchange_time(monkeypatch):
+    agent = MarketDataAgent()
+    provider = agent.providers['binance']
+    monkeypatch.setattr(provider, "_ensure_connection", lambda: None)
+    monkeypatch.setattr(agent, "get_metadata_many", lambda symbols: {s: {'name': s} for s in symbols})
+    provider.subscribe(["BTC-USD"])
+    trade_time = time.time() - 0.3
+    provider.ticks.on_trade("BTCUSDT", 65000.0, 0.1, trade_time)
+
+    assert agent.get_market_data("BTC-USD")['price'] == 65000.0
+    assert agent.price_history["BTC-USD"].timestamp_at(-1) == trade_time
+    assert provider.feed_lag >= 0.3
+
+def test_tick_listeners_receive_pushed_trades(monkeypatch):
+    agent = MarketDataAgent()
+    provider = agent.providers['binance']
+    monkeypatch.setattr(provider, "_ensure_connection", lambda: None)
+    received = []
+
+    def listener(symbol, price, ts):
+        received.append((symbol, price, ts))
+
+    assert agent.subscribe_ticks("BTC-USD", listener)
+    assert not agent.subscribe_ticks("AAPL", listener) # REST 輪詢型 provider 不支援推播
+    provider.ticks.on_trade("BTCUSDT", 65000.0, 0.1, 1000.0)
+    provider._publish("BTCUSDT", 65000.0, 1000.0)
+    agent.unsubscribe_ticks("BTC-USD", listener)
+    provider._publish("BTCUSDT", 65001.0, 1000.1)
+
+    assert received == [("BTC-USD", 65000.0, 1000.0)]
+
+def test_ingest_tick_downsamples_history():
+    agent = MarketDataAgent()
+    agent.simulation_mode = True
+    for i in range(10):
+        agent.ingest_tick("BTC-USD", 100.0 + i, 1000.0 + i * 0.1)
+    # 每秒最多 max_ticks_per_second (2) 筆
+    assert list(agent.price_history["BTC-USD"].timestamps()) == [1000.0, 1000.5]
+
+def test_metadata_misses_are_fetched_in_one_batch(monkeypatch, tmp_path):
+    from core.metadata_cache import SymbolMetadataCache
+    agent = MarketDataAgent()
+    agent.metadata_cache = SymbolMetadataCache(cache_file=str(tmp_path / "cache.json"))
+    agent.metadata_cache.put("TaiwanStockProvider", "2330.TW", {'name': "台積電"})
+    batches = []
+
+    def fake_quotes(symbols):
+        batches.append(list(symbols))
+        return {s: {'name': s, 'exchange': "TWSE"} for s in symbols}
+
+    monkeypatch.setattr(agent.providers['tw'].mis, "get_quotes", fake_quotes)
+    metadata = agent.get_metadata_many(["2330.TW", "2317.TW", "2454.TW"])
+
+    assert batches == [["2317.TW", "2454.TW"]]
+    assert metadata["2330.TW"]['name'] == "台積電"
+    assert metadata["2454.TW"] == {'name': "2454.TW", 'currency': "TWD", 'exchange': "TWSE"}
+    assert agent.get_metadata_many(["2454.TW"])["2454.TW"]['name'] == "2454.TW" # 已寫入快取
+    assert len(batches) == 1
@@ -0,0 +1,69 @@
+from core.flash_crash import FlashCrashDetector
+from core.history import PriceRingBuffer
+
+def _detector(**kwargs):
+    buffer = PriceRingBuffer.for_horizon(900, 2)
+    detector = FlashCrashDetector(buffer, **kwargs)
+
+    def feed(timestamp, price):
+        detector.before_append()
+        buffer.append(timestamp, price)
+        detector.update()
+    return detector, feed
+
+def test_fast_wick_fires_short_window():
+    detector, feed = _detector()
+    for i, p in enumerate([100.1, 99.9, 100.2, 99.8, 100.0, 100.1]):
+        feed(float(i), p)
+    feed(6.0, 97.0)
+
+    signal = detector.evaluate(97.0)
+    assert signal['window'] == 10
+    assert signal['z_score'] < -2.0
+    assert signal['velocity'] > 0
+
+def test_slow_bleed_fires_long_window_without_z_score():
+    detector, feed = _detector()
+    # 每 10 秒跌 0.2%，1 分鐘內不到 1.5%，但 5 分鐘內累積跌幅超過 3%
+    price = 100.0
+    for i in range(35):
+        feed(i * 10.0, price)
+        price *= 0.998
+
+    signal = detector.evaluate(price / 0.998)
+    assert signal is not None
+    assert signal['window'] == 300
+
+def test_calm_market_does_not_fire():
+    detector, feed = _detector()
+    for i in range(20):
+        feed(float(i), 100.0 + (i % 2) * 0.1)
+    assert detector.evaluate(100.0) is None
+
+def test_windows_read_shared_buffer_after_overwrite():
+    # 容量只有 4 筆：被覆蓋前先移出統計，視窗最高價只來自仍在緩衝區的資料
+    buffer = PriceRingBuffer(capacity=4)
+    detector = FlashCrashDetector(buffer, windows=((900, 0.05, 3, False),), min_baseline_samples=3)
+    for i, p in enumerate([120.0, 100.0, 100.0, 100.0, 100.0, 99.0]):
+        detector.before_append()
+        buffer.append(float(i), p)
+        detector.update()
+    assert detector.sample_count == 4
+    assert detector.evaluate(99.0) is None
+
+def test_single_crash_is_reported_once():
+    detector, feed = _detector()
+    for i in range(20):
+        feed(i * 0.5, 100.0)
+    signals = []
+    # 6% 急跌後持平 15 分鐘 (0.5 秒一筆)：長視窗一直看得到跌前高點，但只應通報一次
+    for i in range(20, 1820):
+        feed(i * 0.5, 94.0)
+        signal = detector.evaluate(94.0)
+        if signal:
+            signals.append(signal)
+    assert len(signals) == 1
+
+    # 再跌超過 rearm_drop 時重新通報
+    feed(910.5, 92.0)
+    assert detector.evaluate(92.0) is not None
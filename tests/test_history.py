@@ -0,0 +1,51 @@
+from core.history import PriceRingBuffer
+
+def test_ring_buffer_overwrites_oldest():
+    buf = PriceRingBuffer(capacity=3)
+    for i in range(5):
+        buf.append(float(i), 100.0 + i)
+
+    assert len(buf) == 3
+    assert list(buf.prices()) == [102.0, 103.0, 104.0]
+    assert list(buf.timestamps()) == [2.0, 3.0, 4.0]
+    assert buf.price_at(-1) == 104.0
+    assert buf.price_at(-2) == 103.0
+
+def test_window_is_zero_copy_view():
+    buf = PriceRingBuffer(capacity=4)
+    for i in range(6):
+        buf.append(float(i), float(i))
+
+    ts, px = buf.window(3.5)
+    assert isinstance(px, memoryview)
+    assert list(ts) == [4.0, 5.0]
+    assert list(px) == [4.0, 5.0]
+
+def test_horizon_retention_evicts_by_time():
+    buf = PriceRingBuffer.for_horizon(horizon_seconds=60, max_ticks_per_second=2)
+    assert buf.capacity == 120
+
+    for i in range(10):
+        buf.append(i * 10.0, 100.0) # 每 10 秒一筆 (股票輪詢節奏)
+
+    # 最新一筆在 t=90，只保留 t >= 30 的資料
+    assert list(buf.timestamps()) == [30.0, 40.0, 50.0, 60.0, 70.0, 80.0, 90.0]
+
+def test_rolling_stats_match_full_recompute():
+    import statistics
+    from core.history import RollingWindowStats
+
+    buf = PriceRingBuffer(capacity=16)
+    stats = RollingWindowStats(buf, window_seconds=5)
+    prices = [100.0, 101.5, 99.0, 102.0, 98.5, 103.0, 97.0, 100.5]
+    for i, p in enumerate(prices):
+        buf.append(float(i), p)
+        stats.update()
+
+    window = prices[-6:] # t >= 2
+    assert stats.count == len(window)
+    assert abs(stats.mean - statistics.mean(window)) < 1e-9
+    assert abs(stats.std - statistics.stdev(window)) < 1e-9
+    assert stats.window_max == max(window)
+    assert stats.window_max_time == 5.0
+    assert stats.ewma_volatility > 0
@@ -0,0 +1,40 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from core.http import HttpClient
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    calls = 0
+
+    def do_GET(self):
+        type(self).calls += 1
+        status = 503 if type(self).calls == 1 else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    _FlakyHandler.calls = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+def test_retries_5xx_with_backoff(stub_server):
+    client = HttpClient(backoff=0.01)
+    response = client.get(f"{stub_server}/quote")
+    assert response.status_code == 200
+    assert _FlakyHandler.calls == 2
+
+    assert client.get(f"{stub_server}/quote").json() == {"ok": True}
+
+def test_no_retry_returns_last_response(stub_server):
+    client = HttpClient(backoff=0.01)
+    assert client.get(f"{stub_server}/quote", retries=0).status_code == 503
@@ -0,0 +1,39 @@
+from core.market_index import MarketIndexService
+from core.sessions import TWSE
+
+class _FakeClient:
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.calls = []
+
+    def get_quotes(self, symbols):
+        self.calls.append(list(symbols))
+        return {s: self.quotes[s] for s in symbols if s in self.quotes}
+
+def test_refresh_caches_change_and_waits_for_open(monkeypatch):
+    client = _FakeClient({"^TWII": {'price': 22100.0, 'prev_close': 22000.0}})
+    service = MarketIndexService(indices=("^TWII",), client=client, interval=30)
+    # 休市中：抓到收盤價後應睡到一小時後的開盤
+    monkeypatch.setattr(TWSE, "is_open", lambda now=None: False)
+    monkeypatch.setattr(TWSE, "seconds_until_open", lambda now=None: 3600.0)
+
+    assert service.refresh() == ["^TWII"]
+    snapshot = service.get("^TWII")
+    assert snapshot['change'] == 100.0
+    assert round(snapshot['change_pct'], 3) == 0.455
+    assert snapshot['is_open'] is False
+
+    assert service.refresh() == [] # 休市中不再輪詢
+    assert client.calls == [["^TWII"]]
+
+def test_open_market_polls_on_interval_and_retries_failures(monkeypatch):
+    client = _FakeClient({"^GSPC": {'price': 6000.0, 'prev_close': None}})
+    service = MarketIndexService(indices=("^GSPC", "^IXIC"), client=client, interval=0)
+    monkeypatch.setattr("core.market_index.calendar_for_symbol", lambda symbol: type("Open", (), {
+        "is_open": lambda self: True, "seconds_until_open": lambda self: 0.0})())
+
+    assert service.refresh() == ["^GSPC"]
+    assert service.get("^GSPC")['change'] is None
+    assert service.get("^IXIC") is None
+    assert service.refresh() == ["^GSPC"] # interval=0：交易中與失敗的指數每次都到期
+    assert client.calls == [["^GSPC", "^IXIC"], ["^GSPC", "^IXIC"]]
@@ -0,0 +1,36 @@
+from core.metadata_cache import SymbolMetadataCache
+
+def test_fetch_once_then_hit_memory(tmp_path):
+    cache = SymbolMetadataCache(cache_file=str(tmp_path / "cache.json"))
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        return {'name': "台積電", 'currency': "TWD", 'exchange': "TAI"}
+
+    assert cache.get_or_fetch("yf", "2330.TW", fetch)['name'] == "台積電"
+    assert cache.get_or_fetch("yf", "2330.tw", fetch)['currency'] == "TWD"
+    assert calls == ["2330.TW"]
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "cache.json")
+    SymbolMetadataCache(cache_file=path).put("yf", "AAPL", {'name': "Apple Inc."})
+    assert SymbolMetadataCache(cache_file=path).get("yf", "AAPL") == {'name': "Apple Inc."}
+
+def test_ttl_expiry(tmp_path):
+    cache = SymbolMetadataCache(cache_file=str(tmp_path / "cache.json"), ttl_seconds=0)
+    cache.put("yf", "AAPL", {'name': "Apple Inc."})
+    assert cache.get("yf", "AAPL") is None
+
+def test_lru_eviction_and_failed_fetch(tmp_path):
+    cache = SymbolMetadataCache(cache_file=str(tmp_path / "cache.json"), max_entries=2)
+    cache.put("yf", "A", {'name': "A"})
+    cache.put("yf", "B", {'name': "B"})
+    cache.get("yf", "A")           # A 變成最近使用
+    cache.put("yf", "C", {'name': "C"})
+    assert cache.get("yf", "B") is None
+    assert cache.get("yf", "A") is not None
+
+    # 查詢失敗不寫入快取
+    assert cache.get_or_fetch("yf", "D", lambda s: None) is None
+    assert cache.get("yf", "D") is None
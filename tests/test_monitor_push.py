@@ -0,0 +1,38 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from core.config import SharedConfig
+
+def test_wait_for_tick_wakes_on_push_and_conflates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from core.monitor import StockMonitor
+
+    monitor = StockMonitor(SharedConfig(), MagicMock())
+    monkeypatch.setattr(monitor.data_agent, "get_metadata", lambda symbol: {'name': "BTC"})
+    monitor._push_symbol = "BTC-USD"
+
+    monitor._on_tick("ETH-USD", 3000.0, 1.0) # 非監控中的代號不喚醒
+    assert not monitor._tick_event.is_set()
+
+    def push():
+        time.sleep(0.05)
+        monitor._on_tick("BTC-USD", 65000.0, 1000.0)
+        monitor._on_tick("BTC-USD", 65010.0, 1000.2)
+
+    threading.Thread(target=push).start()
+    start = time.monotonic()
+    data = monitor._wait_for_tick("BTC-USD")
+    assert time.monotonic() - start < 1.0
+    assert data['price'] in (65000.0, 65010.0)
+    assert data['name'] == "BTC" and data['stale'] is False
+    monitor.market_index.stop()
+
+def test_wait_for_tick_falls_back_to_polling(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from core.monitor import StockMonitor
+
+    monitor = StockMonitor(SharedConfig(), MagicMock())
+    monitor.push_timeout = 0.05
+    monkeypatch.setattr(monitor.data_agent, "get_market_data", lambda symbol: {'price': 1.0, 'polled': True})
+    assert monitor._wait_for_tick("BTC-USD") == {'price': 1.0, 'polled': True}
+    monitor.market_index.stop()
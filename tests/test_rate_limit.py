@@ -0,0 +1,31 @@
+import pytest
+from core.rate_limit import AdaptiveRateLimiter, RateLimitExceeded
+
+def test_token_bucket_limits_burst():
+    limiter = AdaptiveRateLimiter("test", rate=1.0, burst=2)
+    assert limiter.acquire(timeout=0)
+    assert limiter.acquire(timeout=0)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(timeout=0.1)
+
+def test_429_blocks_and_stretches_interval_then_recovers():
+    limiter = AdaptiveRateLimiter("test", rate=4.0, burst=4)
+    limiter.on_response(429, {"Retry-After": "2"})
+
+    assert limiter.rate == 2.0
+    assert limiter.interval(10) == 20
+    assert limiter.interval(0.5) > 1.5 # 封鎖期內至少等到 Retry-After 結束
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire(timeout=0.1)
+
+    for _ in range(20):
+        limiter.on_response(200, {})
+    assert limiter.rate == 4.0
+    assert limiter.slowdown == 1.0
+
+def test_binance_weight_header_slows_down_before_ban():
+    limiter = AdaptiveRateLimiter("binance", rate=10.0, weight_header="X-MBX-USED-WEIGHT-1M", weight_limit=6000)
+    limiter.on_response(200, {"X-MBX-USED-WEIGHT-1M": "1200"})
+    assert limiter.rate == 10.0
+    limiter.on_response(200, {"X-MBX-USED-WEIGHT-1M": "5000"})
+    assert limiter.rate == 5.0
@@ -0,0 +1,35 @@
+from core.scheduler import PollScheduler
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_pops_only_due_symbols_in_order():
+    clock = _Clock()
+    scheduler = PollScheduler(clock=clock)
+    scheduler.schedule("BTC-USD", 0.5)
+    scheduler.schedule("2330.TW", 5)
+    scheduler.schedule("AAPL", 10)
+
+    assert scheduler.pop_due() == []
+    assert scheduler.seconds_until_next() == 0.5
+    clock.now = 6
+    assert scheduler.pop_due() == ["BTC-USD", "2330.TW"]
+    assert "BTC-USD" not in scheduler and "AAPL" in scheduler
+    assert scheduler.seconds_until_next() == 4
+
+def test_reschedule_and_remove_skip_stale_entries():
+    clock = _Clock()
+    scheduler = PollScheduler(clock=clock)
+    scheduler.schedule("AAPL", 1)
+    scheduler.schedule("AAPL", 3600) # 休市：改排到開盤
+    scheduler.schedule("MSFT", 1)
+    scheduler.remove("MSFT")
+
+    clock.now = 2
+    assert scheduler.pop_due() == []
+    assert len(scheduler) == 1
+    assert scheduler.seconds_until_next() == 3598
@@ -0,0 +1,40 @@
+import datetime
+from zoneinfo import ZoneInfo
+from core.sessions import NYSE, TWSE, calendar_for_symbol
+
+TPE = ZoneInfo("Asia/Taipei")
+NY = ZoneInfo("America/New_York")
+
+def test_twse_regular_session():
+    monday_morning = datetime.datetime(2026, 3, 2, 10, 0, tzinfo=TPE)
+    assert TWSE.is_open(monday_morning)
+    assert TWSE.next_close(monday_morning) == datetime.datetime(2026, 3, 2, 13, 30, tzinfo=TPE)
+
+    friday_evening = datetime.datetime(2026, 3, 6, 14, 0, tzinfo=TPE)
+    assert not TWSE.is_open(friday_evening)
+    assert TWSE.next_open(friday_evening) == datetime.datetime(2026, 3, 9, 9, 0, tzinfo=TPE)
+
+def test_twse_skips_lunar_new_year():
+    before_holiday = datetime.datetime(2026, 2, 11, 14, 0, tzinfo=TPE)
+    assert TWSE.next_open(before_holiday) == datetime.datetime(2026, 2, 23, 9, 0, tzinfo=TPE)
+
+def test_nyse_handles_dst_from_taipei():
+    # 夏令時間：紐約 9:30 = 台北 21:30；冬令時間：台北 22:30
+    summer = datetime.datetime(2026, 7, 6, 21, 45, tzinfo=TPE)
+    winter = datetime.datetime(2026, 12, 7, 21, 45, tzinfo=TPE)
+    assert NYSE.is_open(summer)
+    assert not NYSE.is_open(winter)
+    assert NYSE.next_open(winter) == datetime.datetime(2026, 12, 7, 9, 30, tzinfo=NY)
+
+def test_nyse_holiday_and_early_close():
+    assert not NYSE.is_open(datetime.datetime(2026, 11, 26, 11, 0, tzinfo=NY)) # 感恩節
+    black_friday = datetime.datetime(2026, 11, 27, 10, 0, tzinfo=NY)
+    assert NYSE.next_close(black_friday) == datetime.datetime(2026, 11, 27, 13, 0, tzinfo=NY)
+    assert not NYSE.is_open(datetime.datetime(2026, 11, 27, 14, 0, tzinfo=NY))
+
+def test_seconds_until_open_and_symbol_mapping():
+    saturday = datetime.datetime(2026, 3, 7, 9, 0, tzinfo=TPE)
+    assert TWSE.seconds_until_open(saturday) == 48 * 3600
+    assert calendar_for_symbol("2330.TW") is TWSE
+    assert calendar_for_symbol("6488.two") is TWSE
+    assert calendar_for_symbol("AAPL") is NYSE
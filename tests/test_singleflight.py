@@ -0,0 +1,38 @@
+import threading
+import time
+from core.singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_fetch():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch(symbols):
+        calls.append(tuple(symbols))
+        time.sleep(0.2)
+        return {s: 100.0 for s in symbols}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do_many("yf", ["2330.TW"], fetch)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [("2330.TW",)]
+    assert results == [{"2330.TW": 100.0}] * 5
+
+def test_fresh_results_are_reused_and_none_is_not_cached():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch(symbols):
+        calls.append(tuple(symbols))
+        return {"AAPL": 190.0, "MSFT": None}
+
+    flight.do_many("yf", ["AAPL", "MSFT"], fetch, fresh_seconds=5)
+    flight.do_many("yf", ["AAPL", "MSFT"], fetch, fresh_seconds=5)
+    assert calls == [("AAPL", "MSFT"), ("MSFT",)]
+
+    assert flight.do("key", lambda: 1, fresh_seconds=5) == 1
+    assert flight.do("key", lambda: 2, fresh_seconds=5) == 1
@@ -0,0 +1,48 @@
+import pytest
+from core.thresholds import ThresholdIndex
+
+def test_only_crossed_levels_fire_in_crossing_order():
+    index = ThresholdIndex()
+    index.set_levels("2330.TW", up=[(1100, "tp2"), (1050, "tp1"), (1200, "tp3")],
+                     down=[(900, "sl1"), (850, "sl2")])
+
+    assert index.update("2330.TW", 1000) == [] # 第一筆只作為起點
+    assert index.update("2330.TW", 1100) == [('up', 1050, "tp1"), ('up', 1100, "tp2")]
+    assert index.update("2330.TW", 1150) == []
+    assert index.update("2330.TW", 840) == [('down', 900, "sl1"), ('down', 850, "sl2")]
+    assert index.update("2330.TW", 900) == [] # 向上回到停損價不觸發
+    assert index.update("2330.TW", 1050) == [('up', 1050, "tp1")] # 再次穿越會再觸發
+
+def test_boundaries_and_add():
+    index = ThresholdIndex()
+    index.add("AAPL", 200.0, 'up')
+    index.add("AAPL", 190.0, 'down', rule="stop")
+    index.update("AAPL", 195.0)
+    assert index.update("AAPL", 200.0) == [('up', 200.0, 200.0)] # 剛好碰到價位即觸發
+    assert index.update("AAPL", 190.0) == [('down', 190.0, "stop")]
+    assert index.levels("AAPL") == ([200.0], [190.0])
+    with pytest.raises(ValueError):
+        index.add("AAPL", 1.0, 'sideways')
+
+def test_jitter_around_level_fires_once_until_rearmed():
+    index = ThresholdIndex(rearm_band=0.005)
+    index.set_levels("2330.TW", up=[(1050, "tp1")], down=[(900, "sl1")])
+    index.update("2330.TW", 1040)
+    assert index.update("2330.TW", 1051) == [('up', 1050, "tp1")]
+    for price in (1049, 1051, 1048, 1052): # 在價位附近來回跳動
+        assert index.update("2330.TW", price) == []
+
+    index.update("2330.TW", 1044) # 回落超過 0.5% (1044.75) 才重新啟用
+    assert index.update("2330.TW", 1050) == [('up', 1050, "tp1")]
+
+    index.set_levels("2330.TW", up=[(1050, "tp1"), (1100, "tp2")], down=[(900, "sl1")])
+    assert index.update("2330.TW", 1100) == [('up', 1100, "tp2")] # 改設定不會重新啟用已觸發的價位
+
+def test_track_moves_start_point_without_firing():
+    index = ThresholdIndex()
+    index.set_levels("AAPL", up=[(200.0, "tp")], down=[(150.0, "sl")])
+    index.update("AAPL", 180.0)
+    index.track("AAPL", 210.0) # 暫停期間漲破 200
+    index.track("AAPL", 205.0)
+    assert index.update("AAPL", 206.0) == [] # 恢復後不補發
+    assert index.update("AAPL", 149.0) == [('down', 150.0, "sl")]
@@ -0,0 +1,30 @@
+import json
+from core.ticks import TickConflator, parse_trade
+
+def _trade(symbol, price, qty, trade_ms):
+    return json.dumps({"stream": f"{symbol.lower()}@trade", "data": {
+        "e": "trade", "E": trade_ms + 5, "s": symbol, "t": 1, "p": price, "q": qty, "T": trade_ms, "m": True, "M": True
+    }}, separators=(",", ":"))
+
+def test_parse_trade_fast_path_and_fallback():
+    assert parse_trade(_trade("BTCUSDT", "65000.10", "0.5", 1_700_000_000_123)) == \
+        ("BTCUSDT", 65000.1, 0.5, 1_700_000_000.123)
+    # 有空白的格式走 json.loads 後備
+    spaced = json.dumps(json.loads(_trade("ETHUSDT", "3000", "2", 1_700_000_000_000)))
+    assert parse_trade(spaced) == ("ETHUSDT", 3000.0, 2.0, 1_700_000_000.0)
+    assert parse_trade('{"result":null,"id":1}') is None
+
+def test_conflator_keeps_latest_and_ohlcv_by_exchange_time():
+    ticks = TickConflator(interval=1.0)
+    ticks.on_trade("BTCUSDT", 100.0, 1.0, 10.1, local_ts=10.3)
+    ticks.on_trade("BTCUSDT", 102.0, 2.0, 10.5, local_ts=10.7)
+    ticks.on_trade("BTCUSDT", 99.0, 1.0, 10.9, local_ts=11.1)
+    ticks.on_trade("BTCUSDT", 101.0, 0.5, 11.2, local_ts=11.4)
+
+    assert ticks.latest("BTCUSDT") == (101.0, 11.2, 11.4)
+    assert ticks.bars("BTCUSDT") == [(10.0, 100.0, 102.0, 99.0, 99.0, 4.0), (11.0, 101.0, 101.0, 101.0, 101.0, 0.5)]
+    assert round(ticks.feed_lag, 6) == 0.2
+
+    ticks.on_quote("BTCUSDT", 100.5, timestamp=12.0) # REST 報價不計入 K 棒
+    assert ticks.latest("BTCUSDT")[0] == 100.5
+    assert len(ticks.bars("BTCUSDT")) == 2
@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from core.http import HttpClient
+from core.rate_limit import AdaptiveRateLimiter
+from core.twse import TwseMisClient
+
+ROWS = {
+    "tse_2330.tw": {"c": "2330", "ex": "tse", "n": "台積電", "z": "1015.0000", "y": "1000.0000",
+                    "b": "1010.0000_1005.0000_", "a": "1015.0000_1020.0000_", "tlong": "1760000000000"},
+    "otc_6488.tw": {"c": "6488", "ex": "otc", "n": "環球晶", "z": "-", "y": "400.0000",
+                    "b": "398.0000_397.5000_", "a": "399.0000_399.5000_", "tlong": "1760000000000"},
+}
+
+class _MisHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        channels = parse_qs(urlparse(self.path).query)["ex_ch"][0].split("|")
+        type(self).requests.append(channels)
+        body = json.dumps({"msgArray": [ROWS[c] for c in channels if c in ROWS], "rtcode": "0000"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def mis_client():
+    _MisHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MisHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/stock/api/getStockInfo.jsp"
+    client = TwseMisClient(base_url=url, http_client=HttpClient(retries=0))
+    client.rate_limiter = AdaptiveRateLimiter("twse-stub", rate=100.0)
+    yield client
+    server.shutdown()
+
+def test_batched_listed_and_otc_quotes(mis_client):
+    quotes = mis_client.get_quotes(["2330.TW", "6488.TWO"])
+
+    assert _MisHandler.requests == [["tse_2330.tw", "otc_6488.tw"]]
+    assert quotes["2330.TW"]["price"] == 1015.0
+    assert quotes["2330.TW"]["name"] == "台積電"
+    # 沒有成交價時以最佳買賣價中間價代替
+    assert quotes["6488.TWO"]["price"] == 398.5
+    assert quotes["6488.TWO"]["exchange"] == "TPEx"
+
+def test_tw_suffix_falls_back_to_otc_and_remembers(mis_client):
+    assert mis_client.get_quotes(["6488.TW"])["6488.TW"]["prev_close"] == 400.0
+    assert _MisHandler.requests == [["tse_6488.tw"], ["otc_6488.tw"]]
+
+    mis_client.get_quotes(["6488.TW"])
+    assert _MisHandler.requests[-1] == ["otc_6488.tw"]
+
+def test_unknown_symbol_is_omitted(mis_client):
+    assert mis_client.get_quotes(["9999.TWO"]) == {}
+
+def test_otc_miss_is_remembered(mis_client):
+    assert mis_client.get_quotes(["9999.TW"]) == {}
+    assert _MisHandler.requests == [["tse_9999.tw"], ["otc_9999.tw"]]
+
+    mis_client.get_quotes(["9999.TW"])
+    assert _MisHandler.requests[-1] == ["tse_9999.tw"] # 不再每一輪補查上櫃
+    assert len(_MisHandler.requests) == 3
+
+def test_all_requests_failing_raises():
+    from core.http import UpstreamError
+    client = TwseMisClient(base_url="http://127.0.0.1:9/stock/api/getStockInfo.jsp", http_client=HttpClient(retries=0))
+    client.rate_limiter = AdaptiveRateLimiter("twse-stub", rate=100.0)
+    with pytest.raises(UpstreamError):
+        client.get_quotes(["2330.TW"])
@@ -0,0 +1,193 @@
+import threading
+import time
+from unittest.mock import MagicMock
+from core.config import SharedConfig
+from core.watchlist import WatchEntry, Watchlist
+
+def test_evaluate_direction_cooldown_and_stop_loss():
+    watchlist = Watchlist()
+    watchlist.sync([{'symbol': "2330.TW", 'target_price': 1000.0, 'stop_loss_price': 900.0, 'cooldown_seconds': 60}])
+
+    def fired(price, now):
+        return {kind: [e.symbol for e in hit] for kind, hit in watchlist.evaluate({"2330.TW": price}, now=now).items() if hit}
+
+    assert fired(950.0, 0) == {}
+    assert watchlist.snapshot()[0]['alert_mode'] == 'above'
+    assert fired(1001.0, 100) == {'target': ["2330.TW"]}
+    assert fired(1002.0, 130) == {} # 冷卻中
+    assert fired(899.0, 200) == {'stop_loss': ["2330.TW"]}
+    assert watchlist.get("2330.TW").price == 899.0
+    assert not hasattr(WatchEntry("AAPL", 1.0), "__dict__")
+
+def test_sync_keeps_state_and_reports_changes():
+    watchlist = Watchlist()
+    assert watchlist.sync([{'symbol': "AAPL", 'target_price': 200}, {'symbol': "BTC-USD", 'target_price': 1e5}]) == \
+        (["AAPL", "BTC-USD"], [])
+    watchlist.evaluate({"AAPL": 190.0})
+
+    added, removed = watchlist.sync([{'symbol': "AAPL", 'target_price': 200, 'stop_loss_price': 150}])
+    assert (added, removed) == ([], ["BTC-USD"])
+    assert watchlist.book.state("AAPL")['alert_mode'] == 'above' # 目標價未變，保留判定結果
+    assert watchlist.get("AAPL").stop_loss == 150.0
+
+def test_config_normalizes_watchlist(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config = SharedConfig()
+    saved = config.set_watchlist([{'symbol': " aapl ", 'target_price': "200"}, {'symbol': "AAPL", 'target_price': 1},
+                                  {'symbol': "BAD"}])
+    assert saved == [{'symbol': "AAPL", 'target_price': 200.0, 'stop_loss_price': 0.0}]
+    assert SharedConfig().watchlist == saved # 重新讀取設定檔
+
+def test_monitor_cycle_batches_and_alerts_per_symbol(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SIMULATION_MODE", "true")
+    from core.monitor import StockMonitor
+
+    config = SharedConfig()
+    tapo = MagicMock()
+    monitor = StockMonitor(config, tapo)
+    monkeypatch.setattr(monitor, "speak", lambda text: None)
+    monkeypatch.setattr(monitor, "_start_alarm", lambda *args: None)
+    batches = []
+
+    def fake_many(symbols):
+        batches.append(list(symbols))
+        prices = {"AAPL": 210.0, "MSFT": 400.0, "BTC-USD": 50000.0}
+        return {s: {'price': prices[s], 'name': s, 'stale': False} for s in symbols}
+
+    monkeypatch.setattr(monitor.data_agent, "get_market_data_many", fake_many)
+    items = [{'symbol': "AAPL", 'target_price': 200.0}, {'symbol': "MSFT", 'target_price': 500.0},
+             {'symbol': "BTC-USD", 'target_price': 60000.0, 'stop_loss_price': 55000.0}]
+
+    assert 0.9 < monitor._run_watchlist_cycle(items) <= 1 # 模擬模式：每檔 1 秒後再次到期
+    assert batches == [["AAPL", "MSFT", "BTC-USD"]]
+    # AAPL 第一筆已高於目標 -> 模式為 below，尚未觸發；BTC 跌破停損
+    tapo.turn_on_red.assert_called_once()
+    assert monitor.watchlist.book.state("MSFT")['alert_mode'] == 'above'
+    assert monitor.watchlist.book.state("BTC-USD")['last_alert_time'] > 0
+    monitor.market_index.stop()
+
+def test_watchlist_crash_alert_uses_cooldown_and_does_not_block(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SIMULATION_MODE", "true")
+    from core.monitor import StockMonitor
+
+    tapo = MagicMock()
+    monitor = StockMonitor(SharedConfig(), tapo)
+    spoken = threading.Event()
+    monkeypatch.setattr(monitor, "speak", lambda text: (time.sleep(1.0), spoken.set()))
+    monkeypatch.setattr(monitor.data_agent, "get_market_data_many",
+                        lambda symbols: {s: {'price': 90.0, 'name': s} for s in symbols})
+    monkeypatch.setattr(monitor.data_agent, "detect_flash_crash",
+                        lambda symbol, price: {'window': 60, 'drop_rate': 0.06})
+    items = [{'symbol': "BTC-USD", 'target_price': 200.0, 'cooldown_seconds': 60}]
+
+    started = time.time()
+    monitor._run_watchlist_cycle(items)
+    monitor.scheduler.schedule("BTC-USD")
+    monitor._run_watchlist_cycle(items)
+    assert time.time() - started < 0.5 # 語音在背景播報
+    tapo.turn_on_purple.assert_called_once() # 冷卻期間不重複警報
+    assert spoken.wait(2)
+    monitor.market_index.stop()
+
+def test_monitor_cycle_defers_closed_markets(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SIMULATION_MODE", "false")
+    from core.monitor import StockMonitor
+
+    monitor = StockMonitor(SharedConfig(), MagicMock())
+    monkeypatch.setattr(monitor, "is_market_open", lambda symbol=None: False)
+    monkeypatch.setattr(monitor, "_backfill_many", lambda symbols: None)
+    batches = []
+    monkeypatch.setattr(monitor.data_agent, "get_market_data_many",
+                        lambda symbols: batches.append(list(symbols)) or {s: {'price': 1.0} for s in symbols})
+    items = [{'symbol': "AAPL", 'target_price': 200.0}, {'symbol': "BTC-USD", 'target_price': 1e5}]
+
+    monitor._run_watchlist_cycle(items)
+    monitor._run_watchlist_cycle(items)
+    # 休市的 AAPL 排到下一次開盤；BTC 0.5 秒後才再次到期
+    assert batches == [["BTC-USD"]]
+    assert monitor.scheduler.seconds_until_next() <= 0.5
+    assert "AAPL" in monitor.scheduler
+    monitor.market_index.stop()
+
+def test_watchlist_ladders_use_threshold_index():
+    watchlist = Watchlist()
+    items = [{'symbol': "2330.TW", 'target_price': 2000.0,
+              'take_profit_levels': [1050.0, 1100.0], 'stop_loss_levels': [900.0]}]
+    watchlist.sync(items)
+    assert watchlist.crossed("2330.TW", 1000.0) == []
+    assert [kind for _, _, kind in watchlist.crossed("2330.TW", 1060.0)] == ["take_profit"]
+
+    watchlist.sync(items) # 設定未變：保留上一筆價格
+    assert watchlist.crossed("2330.TW", 890.0) == [('down', 900.0, "stop_loss")]
+    watchlist.sync([])
+    assert watchlist.crossed("2330.TW", 1200.0) == []
+
+def test_paused_watchlist_keeps_ladder_start_point(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SIMULATION_MODE", "true")
+    from core.monitor import StockMonitor
+
+    monitor = StockMonitor(SharedConfig(), MagicMock())
+    alarms = []
+    monkeypatch.setattr(monitor, "speak", lambda text: None)
+    monkeypatch.setattr(monitor, "_start_alarm", lambda *args: alarms.append(args))
+    prices = {"2330.TW": 1000.0}
+    monkeypatch.setattr(monitor.data_agent, "get_market_data_many",
+                        lambda symbols: {s: {'price': prices[s], 'name': s} for s in symbols})
+    monitor.watchlist.sync([{'symbol': "2330.TW", 'target_price': 2000.0, 'take_profit_levels': [1050.0]}])
+
+    monitor._poll_watchlist(["2330.TW"])
+    monitor.test_mode_until = time.time() + 60
+    prices["2330.TW"] = 1100.0
+    monitor._poll_watchlist(["2330.TW"]) # 暫停期間穿越 1050
+    monitor.test_mode_until = 0
+    monitor._poll_watchlist(["2330.TW"])
+    assert alarms == [] # 恢復後不把暫停期間的穿越一次補發
+    monitor.market_index.stop()
+
+def test_posting_watchlist_wakes_closed_market_sleep(tmp_path, monkeypatch):
+    from datetime import datetime, timedelta, timezone
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SIMULATION_MODE", "true")
+    from core.monitor import StockMonitor
+
+    config = SharedConfig()
+    monitor = StockMonitor(config, MagicMock())
+    monitor.running = True
+    symbol = config.get_config()['symbol']
+    monkeypatch.setattr(monitor.data_agent, "next_market_open",
+                        lambda symbol: datetime.now(timezone.utc) + timedelta(days=2)) # 週末休市
+    threading.Timer(0.1, config.set_watchlist, args=([{'symbol': "BTC-USD", 'target_price': 1e5}],)).start()
+
+    started = time.time()
+    monitor._sleep_until_open(symbol, check_interval=0.05)
+    assert time.time() - started < 1.0
+    monitor.market_index.stop()
+
+def test_watchlist_crash_keeps_purple_for_cooldown(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SIMULATION_MODE", "true")
+    from core.monitor import StockMonitor
+
+    tapo = MagicMock()
+    monitor = StockMonitor(SharedConfig(), tapo)
+    monkeypatch.setattr(monitor, "speak", lambda text: None)
+    monkeypatch.setattr(monitor.data_agent, "get_market_data_many",
+                        lambda symbols: {s: {'price': 90.0, 'name': s} for s in symbols})
+    crashes = [{'window': 60, 'drop_rate': 0.06}]
+    monkeypatch.setattr(monitor.data_agent, "detect_flash_crash",
+                        lambda symbol, price: crashes.pop() if crashes else None)
+    monitor.watchlist.sync([{'symbol': "BTC-USD", 'target_price': 200.0, 'cooldown_seconds': 0.3}])
+
+    monitor._poll_watchlist(["BTC-USD"])
+    monitor._poll_watchlist(["BTC-USD"]) # 下一輪沒有警報：紫燈維持
+    assert monitor.last_color_state == "purple"
+    tapo.turn_on_yellow.assert_not_called()
+
+    time.sleep(0.35)
+    monitor._poll_watchlist(["BTC-USD"])
+    assert monitor.last_color_state == "yellow"
+    monitor.market_index.stop()
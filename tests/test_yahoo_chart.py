@@ -0,0 +1,123 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+import pytest
+from core.http import HttpClient
+from core.rate_limit import AdaptiveRateLimiter
+from core.yahoo_chart import YahooChartClient
+
+def _chart(price, closes, name):
+    return {"chart": {"result": [{
+        "meta": {"regularMarketPrice": price, "chartPreviousClose": 1000.0, "longName": name,
+                 "currency": "TWD", "fullExchangeName": "Taiwan", "regularMarketTime": 1760000100},
+        "timestamp": [1760000000 + 60 * i for i in range(len(closes))],
+        "indicators": {"quote": [{"close": closes}]},
+    }], "error": None}}
+
+CHARTS = {
+    "2330.TW": _chart(1015.0, [1010.0, None, 1015.0], "Taiwan Semiconductor"),
+    "^TWII": _chart(None, [22000.0, 22050.5], None),
+}
+
+class _ChartHandler(BaseHTTPRequestHandler):
+    requests = []
+    spark_status = 200
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/spark"):
+            return self._spark(parse_qs(url.query)["symbols"][0].split(","))
+        symbol = unquote(url.path.rsplit("/", 1)[-1])
+        type(self).requests.append((symbol, parse_qs(url.query)["interval"][0]))
+        if symbol not in CHARTS:
+            body = json.dumps({"chart": {"result": None, "error": {"code": "Not Found"}}}).encode()
+            self.send_response(404)
+        else:
+            body = json.dumps(CHARTS[symbol]).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _spark(self, symbols):
+        type(self).requests.append(("spark", ",".join(symbols)))
+        if type(self).spark_status != 200:
+            self.send_response(type(self).spark_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        result = [{"symbol": s, "response": CHARTS[s]["chart"]["result"]} for s in symbols if s in CHARTS]
+        body = json.dumps({"spark": {"result": result, "error": None}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def chart_client():
+    _ChartHandler.requests = []
+    _ChartHandler.spark_status = 200
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChartHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    root = f"http://127.0.0.1:{server.server_address[1]}"
+    client = YahooChartClient(base_url=root + "/v8/finance/chart/{symbol}", spark_url=root + "/v7/finance/spark",
+                              http_client=HttpClient(retries=0))
+    client.rate_limiter = AdaptiveRateLimiter("yahoo-stub", rate=100.0)
+    yield client
+    server.shutdown()
+
+def test_quote_parses_meta_into_floats(chart_client):
+    quote = chart_client.get_quote("2330.TW")
+    assert quote['price'] == 1015.0
+    assert quote['prev_close'] == 1000.0
+    assert quote['name'] == "Taiwan Semiconductor"
+    assert quote['exchange'] == "Taiwan"
+    assert quote['timestamp'] == 1760000100.0
+
+def test_quote_falls_back_to_last_close_and_skips_nulls(chart_client):
+    assert chart_client.get_quote("^TWII")['price'] == 22050.5
+    history = chart_client.get_history("2330.TW", 5)
+    assert [price for _, price in history] == [1010.0, 1015.0]
+
+def test_get_quotes_batches_through_spark(chart_client):
+    chart_client.batch_size = 2
+    answered = set()
+    quotes = chart_client.get_quotes(["2330.TW", "NOPE", "^TWII"], answered)
+    assert sorted(quotes) == ["2330.TW", "^TWII"]
+    assert quotes["^TWII"]['price'] == 22050.5
+    assert _ChartHandler.requests == [("spark", "2330.TW,NOPE"), ("spark", "^TWII")]
+    assert answered == {"2330.TW", "NOPE", "^TWII"}
+
+def test_failed_batch_raises_and_skips_yfinance(chart_client, monkeypatch):
+    from core.data_agent import YFinanceProvider
+    from core.http import UpstreamError
+
+    _ChartHandler.spark_status = 503
+    provider = YFinanceProvider(chart_client=chart_client)
+    fallbacks = []
+    monkeypatch.setattr(provider, "_yfinance_price", lambda symbol: fallbacks.append(symbol))
+    with pytest.raises(UpstreamError):
+        provider.get_prices(["2330.TW", "NOPE"])
+    assert fallbacks == []
+
+def test_yfinance_provider_uses_chart_client(chart_client, monkeypatch):
+    from core.data_agent import YFinanceProvider
+
+    provider = YFinanceProvider(chart_client=chart_client)
+    monkeypatch.setattr(provider, "_yfinance_price", lambda symbol: 42.0)
+
+    assert provider.get_prices(["2330.TW", "NOPE"]) == {"2330.TW": 1015.0, "NOPE": 42.0}
+    assert provider.get_metadata("2330.TW") == {'name': "Taiwan Semiconductor", 'currency': "TWD",
+                                                'exchange': "Taiwan"}
+
+def test_twenty_symbols_cost_one_request(chart_client):
+    chart_client.rate_limiter = AdaptiveRateLimiter("yahoo-stub", rate=1.0, burst=1)
+    symbols = ["2330.TW"] + [f"S{i}" for i in range(19)]
+    assert list(chart_client.get_quotes(symbols)) == ["2330.TW"]
+    assert _ChartHandler.requests == [("spark", ",".join(symbols))]
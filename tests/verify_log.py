@@ -30,9 +30,10 @@ class MockMonitor:
         crash_price = 90.0
         self.data_agent._clean_data(symbol, crash_price)
         
-        drop_rate = self.data_agent.detect_flash_crash(symbol, crash_price)
-        if drop_rate:
-            self.add_log(f"⚠️ 偵測到閃崩！實質跌幅 {drop_rate*100:.1f}%")
+        crash = self.data_agent.detect_flash_crash(symbol, crash_price)
+        if crash:
+            drop_rate = crash['drop_rate']
+            self.add_log(f"⚠️ 偵測到閃崩！{crash['window']} 秒內實質跌幅 {drop_rate*100:.1f}%")
             self.tapo.turn_on_purple()
             self.speak(f"警告，{self.last_stock_name} 偵測到恐慌性閃崩，目前跌幅百分之 {drop_rate*100:.1f}。")
         else:
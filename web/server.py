@@ -38,6 +38,7 @@ class WebServer(threading.Thread):
         self.app.add_url_rule('/api/market_status', 'market_status', self.market_status, methods=['GET'])
         self.app.add_url_rule('/api/demo_alert', 'demo_alert', self.demo_alert, methods=['POST'])
         self.app.add_url_rule('/api/market_data', 'market_data', self.market_data, methods=['GET'])
+        self.app.add_url_rule('/api/watchlist', 'watchlist', self.watchlist, methods=['GET', 'POST'])
         self.app.add_url_rule('/api/logs', 'get_logs', self.get_logs, methods=['GET'])
         self.app.add_url_rule('/api/check_update', 'check_update', self.check_update, methods=['GET'])
         self.app.add_url_rule('/api/apply_update', 'apply_update', self.apply_update, methods=['POST'])
@@ -164,6 +165,7 @@ class WebServer(threading.Thread):
         return jsonify({
             "market_index": self.monitor.last_market_index,
             "market_change": self.monitor.last_market_change,
+            "market_indices": self.monitor.market_index.snapshot(), # ^TWII / ^GSPC / ^IXIC 快取
             "stock_price": self.monitor.last_stock_price,
             "stock_name": self.monitor.last_stock_name,
             "update_time": self.monitor.last_update_time,
@@ -171,6 +173,18 @@ class WebServer(threading.Thread):
             "alert_active": self.monitor.alarm_active or self.monitor.tapo.is_alerting_state() # Hybrid logic
         })
 
+    def watchlist(self):
+        """GET：各代號的即時狀態；POST：設定監控清單 {"watchlist": [{symbol, target_price, stop_loss_price, cooldown_seconds}]}。"""
+        if request.method == 'POST':
+            items = (request.json or {}).get('watchlist', [])
+            watchlist = self.shared_config.set_watchlist(items)
+            print(f"網頁更新監控清單: {len(watchlist)} 檔")
+            return jsonify({"status": "success", "watchlist": watchlist})
+        return jsonify({
+            "watchlist": self.monitor.watchlist.snapshot(),
+            "update_time": self.monitor.last_update_time
+        })
+
     def simulate_data(self):
         data = request.json
         price = data.get('price')